@@ -0,0 +1,171 @@
+import struct
+
+from django.core.cache import caches
+from django_redis import get_redis_connection
+from django_redis.cache import RedisCache
+from redis.exceptions import WatchError
+
+# the members are packed in bit order, the member of bit n is at byte n * MEMBER_SIZE
+MEMBER_FORMAT = ">Q"
+MEMBER_SIZE = struct.calcsize(MEMBER_FORMAT)
+
+# KEYS: bits, members | returns the packed member of the first set bit, nil if not built
+FIRST_SET_SCRIPT = f"""
+if redis.call("EXISTS", KEYS[2]) == 0 then
+    return false
+end
+local position = redis.call("BITPOS", KEYS[1], 1)
+if position < 0 then
+    return ""
+end
+return redis.call("GETRANGE", KEYS[2], position * {MEMBER_SIZE}, (position + 1) * {MEMBER_SIZE} - 1)
+"""
+
+# attempts of a build changed meanwhile, answered from the rows read after that
+BUILD_ATTEMPTS = 3
+
+# KEYS: bits, positions, version | ARGV: member, bit | returns the previous bit, -1 if not built or not a member
+SET_SCRIPT = """
+redis.call("INCR", KEYS[3])
+local position = redis.call("HGET", KEYS[2], ARGV[1])
+if not position then
+    return -1
+end
+return redis.call("SETBIT", KEYS[1], position, ARGV[2])
+"""
+
+
+class CacheBitmap:
+    """
+    A bitmap per key, of a flag over an ordered set of members (ids), kept in the redis
+    cache. Checking for a set bit & finding the member of the first set bit are single
+    bit operations, answered without the database.
+
+        bitmap = CacheBitmap("bed-inventory", loader=lambda *key: [(id, is_available), ...])
+        bitmap.first_set(property_id, room_type_id)
+
+    The bitmap is built from the `loader` on the first lookup of the key & dropped after
+    `timeout`. Flip the bit of a member with `set(...)` once its change is committed, or
+    `invalidate(...)` when the members change. Both bump the version of the key, a build
+    that read the rows before is not written | see `build`.
+
+    Note: needs the `django_redis` cache, see `is_enabled`. Use the database otherwise, the
+    `set(...)` & `invalidate(...)` are ignored then.
+    """
+
+    def __init__(self, prefix, loader, timeout=None):
+        self.prefix = prefix
+        self.loader = loader
+        self.timeout = timeout
+        self.scripts = {}
+
+    @staticmethod
+    def is_enabled():
+        """Whether the cache is redis, the in-memory cache has no bit operations."""
+
+        return isinstance(caches["default"], RedisCache)
+
+    @staticmethod
+    def get_client():
+        return get_redis_connection("default")
+
+    def get_script(self, script):
+        if script not in self.scripts:
+            self.scripts[script] = self.get_client().register_script(script)
+        return self.scripts[script]
+
+    def get_keys(self, *key):
+        """Returns the bits, members, positions & version keys. Hash tagged, for the scripts on a cluster."""
+
+        tag = f"{{{self.prefix}:{':'.join(map(str, key))}}}"
+        return f"{tag}:bits", f"{tag}:members", f"{tag}:positions", f"{tag}:version"
+
+    def build(self, *key):
+        """
+        Builds the bitmap of the key from the `loader`, replaces the existing one. The version
+        is watched while the rows are read, the rows are stale if a bit is set or the bitmap
+        invalidated meanwhile & read again then. Returns the rows read, built or not.
+        """
+
+        bits_key, members_key, positions_key, version_key = self.get_keys(*key)
+
+        with self.get_client().pipeline(transaction=True) as pipeline:
+            for _ in range(BUILD_ATTEMPTS):
+                pipeline.watch(version_key)
+                rows = list(self.loader(*key))
+                bits = bytearray((len(rows) + 7) // 8)
+                for position, (_, is_set) in enumerate(rows):
+                    if is_set:
+                        bits[position >> 3] |= 0x80 >> (position & 7)
+
+                pipeline.multi()
+                pipeline.delete(positions_key)
+                if rows:
+                    positions = {member: position for position, (member, _) in enumerate(rows)}
+                    pipeline.hset(positions_key, mapping=positions)
+                    pipeline.expire(positions_key, self.timeout)
+                pipeline.set(bits_key, bytes(bits), ex=self.timeout)
+                members = b"".join(struct.pack(MEMBER_FORMAT, member) for member, _ in rows)
+                pipeline.set(members_key, members, ex=self.timeout)
+                try:
+                    pipeline.execute()
+                    break
+                except WatchError:
+                    continue
+
+        return rows
+
+    def first_set(self, *key):
+        """Returns the member of the first set bit, None if no bit is set. Built if missing."""
+
+        keys = self.get_keys(*key)[:2]
+        member = self.get_script(FIRST_SET_SCRIPT)(keys=keys)
+        if member is None:
+            rows = self.build(*key)
+            member = self.get_script(FIRST_SET_SCRIPT)(keys=keys)
+            if member is None:
+                # not built, changed meanwhile
+                return next((member for member, is_set in rows if is_set), None)
+
+        return struct.unpack(MEMBER_FORMAT, member)[0] if member else None
+
+    def count(self, *key):
+        """Returns the number of set bits. Built if missing."""
+
+        bits_key, members_key, *_ = self.get_keys(*key)
+        pipeline = self.get_client().pipeline(transaction=False)
+        pipeline.exists(members_key)
+        pipeline.bitcount(bits_key)
+        exists, count = pipeline.execute()
+        if not exists:
+            rows = self.build(*key)
+            pipeline.exists(members_key)
+            pipeline.bitcount(bits_key)
+            exists, count = pipeline.execute()
+            if not exists:
+                # not built, changed meanwhile
+                return sum(1 for _, is_set in rows if is_set)
+
+        return count
+
+    def set(self, *key, member, value):
+        """Sets the bit of the member, nothing to do if the bitmap is not built."""
+
+        if not self.is_enabled():
+            return
+
+        bits_key, _, positions_key, version_key = self.get_keys(*key)
+        self.get_script(SET_SCRIPT)(keys=[bits_key, positions_key, version_key], args=[member, int(bool(value))])
+
+    def invalidate(self, *key):
+        """Drops the bitmap of the key, built again on the next lookup."""
+
+        if not self.is_enabled():
+            return
+
+        *keys, version_key = self.get_keys(*key)
+        pipeline = self.get_client().pipeline(transaction=True)
+        pipeline.delete(*keys)
+        # not dropped, a build in progress is to see the change
+        pipeline.incr(version_key)
+        pipeline.execute()
@@ -0,0 +1,80 @@
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from rest_framework import filters
+from rest_framework.compat import distinct
+
+
+class AppSearchFilter(filters.SearchFilter):
+    """
+    Applications version of the `SearchFilter`. Drop in replacement, the `search_fields`
+    work as before. Fields prefixed with `%` are searched using the postgres `pg_trgm`:
+
+        search_fields = ["%name", "%city", "=code"]
+
+    For these fields:
+        1. The `ILIKE '%term%'` is kept, which is served by a `gin_trgm_ops` index on the
+           column instead of scanning the table.
+        2. Terms with typos are matched on the word similarity (`%>`), same index.
+        3. Results are ranked on the similarity (`search_rank`), best first, unless an
+           `ordering` is requested.
+
+    The `%` fields should be columns of the model itself & need a trigram index, see the
+    `GinIndex(..., opclasses=["gin_trgm_ops"])` of `Property`. On other databases they
+    are plain `icontains` lookups.
+    """
+
+    trigram_prefix = "%"
+    lookup_prefixes = {**filters.SearchFilter.lookup_prefixes, trigram_prefix: "icontains"}
+    rank_annotation = "search_rank"
+
+    def get_trigram_fields(self, search_fields):
+        """Returns the fields that are to be searched & ranked on the trigram similarity."""
+
+        if connection.vendor != "postgresql":
+            return []
+
+        return [str(_)[1:] for _ in search_fields if str(_).startswith(self.trigram_prefix)]
+
+    def filter_queryset(self, request, queryset, view):
+        """Overridden to match & rank the trigram fields, same as the `SearchFilter` otherwise."""
+
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        trigram_fields = self.get_trigram_fields(search_fields or [])
+
+        if not search_fields or not search_terms or not trigram_fields:
+            return super().filter_queryset(request, queryset, view)
+
+        orm_lookups = [self.construct_search(str(_)) for _ in search_fields]
+
+        base = queryset
+        conditions = []
+        for search_term in search_terms:
+            queries = [
+                *[Q(**{orm_lookup: search_term}) for orm_lookup in orm_lookups],
+                *[Q(**{f"{field}__trigram_word_similar": search_term}) for field in trigram_fields],
+            ]
+            conditions.append(reduce(operator.or_, queries))
+        queryset = queryset.filter(reduce(operator.and_, conditions))
+
+        if self.must_call_distinct(queryset, search_fields):
+            queryset = distinct(queryset, base)
+
+        # best matching field per term, summed over the terms
+        ranks = [
+            Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+            for similarities in [
+                [TrigramWordSimilarity(search_term, field) for field in trigram_fields] for search_term in search_terms
+            ]
+        ]
+        queryset = queryset.annotate(**{self.rank_annotation: reduce(operator.add, ranks)})
+
+        # the `OrderingFilter` replaces this, if the ordering is requested
+        return queryset.order_by(
+            f"-{self.rank_annotation}", *(queryset.query.order_by or queryset.model._meta.ordering)
+        )
@@ -8,15 +8,21 @@ import string
 import time
 import typing
 
+import numpy as np
 from dateutil import tz
 from django.conf import settings
 from django.core.cache import cache
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
 from requests import request
 
 logger = logging.getLogger(__name__)
 
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE_LATITUDE = math.pi * EARTH_RADIUS_KM / 180
+
 
 def create_log(data: typing.Any, category: str):
     """
@@ -234,6 +240,17 @@ def validate_otp(phone_number, otp):
     return True
 
 
+def incr_cache_counter(key: str, delta: int = 1):
+    """Increments the counter in the cache, created if missing. Never expires. Returns the value."""
+
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # missing, a single round trip otherwise
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
 def haversine(lat1, lon1, lat2, lon2):
     """Formula for find the nearest place to the given latitude and longitude"""
 
@@ -242,5 +259,60 @@ def haversine(lat1, lon1, lat2, lon2):
     dlon = lon2 - lon1
     a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
     c = 2 * math.asin(math.sqrt(a))
-    r = 6371
-    return c * r
+    return c * EARTH_RADIUS_KM
+
+
+def haversine_vectorized(latitude, longitude, latitudes, longitudes):
+    """
+    Numpy version of `haversine`. Returns the distances in km between the given point
+    and every point of the `latitudes` & `longitudes` arrays, calculated in one pass.
+    """
+
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(np.asarray(latitudes, dtype=np.float64)), np.radians(
+        np.asarray(longitudes, dtype=np.float64)
+    )
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.sqrt(a), 1.0))
+
+
+def haversine_expression(latitude, longitude, latitude_field="latitude", longitude_field="longitude"):
+    """
+    Database version of `haversine`. Returns an expression that calculates the distance
+    in km between the given point and the lat/long fields of the row. Used to annotate,
+    filter and order querysets without loading the rows in python.
+    """
+
+    lat1, lon1 = math.radians(float(latitude)), math.radians(float(longitude))
+    lat2 = Radians(Cast(latitude_field, output_field=FloatField()))
+    lon2 = Radians(Cast(longitude_field, output_field=FloatField()))
+    a = Power(Sin((lat2 - Value(lat1)) / Value(2.0)), 2) + Value(math.cos(lat1)) * Cos(lat2) * Power(
+        Sin((lon2 - Value(lon1)) / Value(2.0)), 2
+    )
+
+    # rounding errors can push sqrt(a) slightly above 1, which is out of range for asin
+    return Value(2.0 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+def get_bounding_box(latitude, longitude, radius):
+    """
+    Returns the (min_lat, max_lat, min_lon, max_lon) box that encloses the circle of `radius`
+    km around the given point. Used as an index friendly pre-filter before the exact distance
+    is calculated. The longitude bounds are None when the box crosses a pole or the 180th
+    meridian, the latitude bounds alone are used then.
+    """
+
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = radius / KM_PER_DEGREE_LATITUDE
+    min_lat, max_lat = latitude - lat_delta, latitude + lat_delta
+
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), None, None
+
+    lon_delta = math.degrees(math.asin(min(math.sin(radius / EARTH_RADIUS_KM) / math.cos(math.radians(latitude)), 1)))
+    min_lon, max_lon = longitude - lon_delta, longitude + lon_delta
+
+    if min_lon < -180 or max_lon > 180:
+        return min_lat, max_lat, None, None
+
+    return min_lat, max_lat, min_lon, max_lon
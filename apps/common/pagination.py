@@ -1,4 +1,15 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.paginator import Page
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class AppPagination(PageNumberPagination):
@@ -10,3 +21,210 @@ class AppPagination(PageNumberPagination):
     page_size = 24
     page_size_query_param = "page-size"
     max_page_size = 100
+
+
+class EstimatedCountPage(Page):
+    """Page of the `EstimatedCountPaginator`, knows if there is a next page from the rows fetched."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """
+    Paginator that counts the rows using the postgres planner when there are a lot of them.
+
+        1. No filters, `pg_class.reltuples` of the table (kept up to date by `ANALYZE`).
+        2. Otherwise, the `Plan Rows` of `EXPLAIN` on the query.
+
+    Below the `estimate_threshold` the exact `COUNT(*)` is used, which is cheap at that size.
+    """
+
+    def __init__(self, *args, estimate_threshold, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimate_threshold = estimate_threshold
+        self.count_is_estimated = False
+
+    def get_estimated_count(self):
+        """Returns the planner estimate of the number of rows, None if not available."""
+
+        queryset = self.object_list
+        if not hasattr(queryset, "query") or connections[queryset.db].vendor != "postgresql":
+            return None
+
+        with connections[queryset.db].cursor() as cursor:
+            if not queryset.query.where and not queryset.query.distinct:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+                # `-1` if the table is not analyzed yet
+                return int(row[0]) if row and row[0] >= 0 else None
+
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return int(plan[0]["Plan"]["Plan Rows"])
+
+    @cached_property
+    def count(self):
+        """Overridden to estimate the count above the threshold."""
+
+        estimate = self.get_estimated_count()
+        if estimate is None or estimate < self.estimate_threshold:
+            return super().count
+
+        self.count_is_estimated = True
+        return estimate
+
+    def validate_number(self, number):
+        """Overridden to allow pages after the estimated count, the estimate can be low."""
+
+        if self.count and self.count_is_estimated and str(number).isdigit() and int(number) > self.num_pages:
+            return int(number)
+        return super().validate_number(number)
+
+    def page(self, number):
+        """Overridden to fetch one more row for the next link, the count does not say it."""
+
+        number = self.validate_number(number)
+        if not self.count_is_estimated:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom : bottom + self.per_page + 1])  # noqa: E203
+        return EstimatedCountPage(rows[: self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+
+class AppEstimatedCountPagination(AppPagination):
+    """
+    `AppPagination` for big tables, where the `COUNT(*)` costs more than the page itself.
+    Above the `estimate_threshold` the count is the postgres planner estimate & is flagged
+    in the response using `count_is_estimated`. Small or narrowly filtered lists still get
+    the exact count.
+    """
+
+    estimate_threshold = 10000
+
+    def django_paginator_class(self, *args, **kwargs):
+        return EstimatedCountPaginator(*args, estimate_threshold=self.estimate_threshold, **kwargs)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_is_estimated"] = self.page.paginator.count_is_estimated
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"]["count_is_estimated"] = {"type": "boolean"}
+        return schema
+
+
+class AppCursorPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on `(created_at, id)`, newest first. Every page seeks from the
+    last row of the previous one using the index, so there is no `COUNT(*)` & no `OFFSET`
+    scan. Deep pages cost the same as the first. The `ordering` param is not supported.
+
+    Response: {"next": "<url>", "previous": "<url>", "results": [...]}
+
+    The models need an index on `(created_at, id)` | see `Property.Meta.indexes`.
+    """
+
+    page_size = AppPagination.page_size
+    page_size_query_param = AppPagination.page_size_query_param
+    max_page_size = AppPagination.max_page_size
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    # the keyset, also needed on the `.values()` rows | see `AppValuesListMixin`
+    required_fields = ["created_at", "id"]
+
+    def get_page_size(self, request):
+        """Returns the page size, same as the `AppPagination`."""
+
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def encode_cursor(self, row, reverse=False):
+        """Returns the url of the page after (or before if `reverse`) the given row."""
+
+        created_at, _id = [row[_] if isinstance(row, dict) else getattr(row, _) for _ in self.required_fields]
+        cursor = urlsafe_b64encode(json.dumps([created_at.isoformat(), _id, reverse]).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """Returns the (created_at, id, reverse) of the cursor in the request, None if not given."""
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+
+        try:
+            created_at, _id, reverse = json.loads(urlsafe_b64decode(cursor.encode()))
+            created_at = parse_datetime(created_at)
+            assert created_at and isinstance(_id, int) and isinstance(reverse, bool)
+        except (AssertionError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return created_at, _id, reverse
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Returns the rows of the page, seeking from the cursor."""
+
+        self.page_size = self.get_page_size(request)
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+
+        if cursor:
+            created_at, _id, _ = cursor
+            # `(created_at, id) < (c, i)`, the first filter keeps it an index range scan
+            if reverse:
+                queryset = queryset.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=_id)
+            else:
+                queryset = queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=_id)
+
+        ordering = ["created_at", "id"] if reverse else ["-created_at", "-id"]
+        rows = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # going back, the page after is where we came from
+        has_next, has_previous = (True, has_more) if reverse else (has_more, cursor is not None)
+        self.next_url = self.encode_cursor(rows[-1]) if rows and has_next else None
+        self.previous_url = self.encode_cursor(rows[0], reverse=True) if rows and has_previous else None
+
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.next_url, "previous": self.previous_url, "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "previous": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
+
+
+# selectable using the `pagination` query param | see `AppModelListAPIViewSet`
+APP_PAGINATION_CLASSES = {
+    "page": AppPagination,
+    "cursor": AppCursorPagination,
+    "estimated": AppEstimatedCountPagination,
+}
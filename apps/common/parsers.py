@@ -0,0 +1,19 @@
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from apps.common.renderers import AppJSONRenderer
+
+
+class AppJSONParser(JSONParser):
+    """Drop in replacement of the `JSONParser` using `orjson`. Only `utf-8` bodies, as per the JSON spec."""
+
+    renderer_class = AppJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Overridden to decode using `orjson`. `NaN` & `Infinity` are rejected, same as the strict mode."""
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
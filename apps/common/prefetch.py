@@ -0,0 +1,164 @@
+import functools
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+from apps.common.serializers import trim_serializer_fields
+
+
+class QuerysetPlan:
+    """
+    The `select_related`, `prefetch_related` & `only` needed to serialize a model without
+    any further queries. Built from the serializer by `build_queryset_plan`.
+
+        plan = get_queryset_plan(PropertyListSerializer)
+        queryset = plan.apply(Property.objects.all())
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.only = {model._meta.pk.name}
+        # cleared when the columns used by the serializer are not known (ex: method fields)
+        self.use_only = True
+        self.select_related = []
+        # (lookup, `QuerysetPlan` of the related model or None for a plain prefetch)
+        self.prefetches = []
+
+    def add_select_related(self, name, plan):
+        """Joins the related object & takes over the plan of it with the `name` prefix."""
+
+        self.only.add(name)
+        self.select_related.append(name)
+        if plan.use_only:
+            self.only.update(f"{name}__{_}" for _ in plan.only)
+        self.select_related.extend(f"{name}__{_}" for _ in plan.select_related)
+        self.prefetches.extend((f"{name}__{lookup}", _) for lookup, _ in plan.prefetches)
+
+    def add_prefetch(self, name, plan):
+        """Prefetches the related objects, queried using the given plan."""
+
+        self.prefetches.append((name, plan))
+
+    def get_models(self):
+        """Returns all the models queried by the plan, the ones the serialized output is made of."""
+
+        def follow(path):
+            model = self.model
+            for name in path.split("__"):
+                model = model._meta.get_field(name).related_model
+            return model
+
+        models = {self.model, *[follow(_) for _ in self.select_related]}
+        for lookup, plan in self.prefetches:
+            models.update(plan.get_models() if plan else [follow(lookup)])
+
+        return models
+
+    def apply(self, queryset):
+        """Applies the plan on the given queryset & returns it."""
+
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetches:
+            queryset = queryset.prefetch_related(
+                *[
+                    Prefetch(lookup, queryset=_.apply(_.model._default_manager.all())) if _ else lookup
+                    for lookup, _ in self.prefetches
+                ]
+            )
+        if self.use_only:
+            queryset = queryset.only(*sorted(self.only))
+
+        return queryset
+
+
+def get_source_fields(model, source_attrs):
+    """Returns the model fields along the `source_attrs`. None if it is not a model field path."""
+
+    path = []
+    for attr in source_attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+
+        path.append(field)
+        model = field.related_model
+
+    return path
+
+
+def build_queryset_plan(serializer, model=None):
+    """
+    Builds the `QuerysetPlan` of the given serializer (instance). Walks the fields:
+        1. Model fields are loaded using `only`.
+        2. Nested serializers on forward relations are joined using `select_related`.
+        3. Nested `many=True` serializers & many related fields are prefetched, the nested
+           serializers are planned the same way for the prefetch queryset.
+        4. Anything that might read other attributes (method fields, properties, `source="*"`)
+           loads all the columns of that level.
+    """
+
+    model = model or serializer.Meta.model
+    plan = QuerysetPlan(model)
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        path = get_source_fields(model, field.source_attrs) if field.source != "*" else None
+        if not path or isinstance(field, serializers.SerializerMethodField):
+            plan.use_only = False
+            continue
+
+        if len(path) > 1:
+            # dotted source like `property.name`, follow the forward relations
+            if any(_.many_to_many or _.one_to_many for _ in path[:-1]):
+                plan.use_only = False
+                continue
+
+            names = [_.name for _ in path]
+            plan.select_related.append("__".join(names[:-1]))
+            plan.only.update("__".join(names[: i + 1]) for i in range(len(names)))
+            continue
+
+        model_field = path[0]
+        if isinstance(field, serializers.ListSerializer):
+            child_plan = build_queryset_plan(field.child, model_field.related_model)
+            if model_field.one_to_many:
+                # the prefetched objects are matched back using the foreign key
+                child_plan.only.add(model_field.field.name)
+            plan.add_prefetch(model_field.name, child_plan)
+        elif isinstance(field, serializers.BaseSerializer):
+            plan.add_select_related(model_field.name, build_queryset_plan(field, model_field.related_model))
+        elif isinstance(field, ManyRelatedField) or model_field.many_to_many or model_field.one_to_many:
+            child_plan = QuerysetPlan(model_field.related_model)
+            if model_field.one_to_many:
+                child_plan.only.add(model_field.field.name)
+            plan.add_prefetch(model_field.name, child_plan)
+        elif model_field.is_relation and not isinstance(field, PrimaryKeyRelatedField):
+            # string or slug of the related object
+            child_plan = QuerysetPlan(model_field.related_model)
+            child_plan.use_only = False
+            plan.add_select_related(model_field.name, child_plan)
+        else:
+            plan.only.add(model_field.name)
+
+    return plan
+
+
+# bounded, the sparse fieldsets come from the clients
+@functools.lru_cache(maxsize=256)
+def get_queryset_plan(serializer_class, sparse_fields=None):
+    """
+    Returns the `QuerysetPlan` of the given serializer class, trimmed to the `sparse_fields`
+    if given (see `parse_sparse_fields`). Built once per class & fieldset.
+    """
+
+    serializer = serializer_class()
+    if sparse_fields:
+        trim_serializer_fields(serializer, sparse_fields)
+
+    return build_queryset_plan(serializer)
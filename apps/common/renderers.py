@@ -0,0 +1,137 @@
+import csv
+import io
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class AppJSONRenderer(JSONRenderer):
+    """
+    Drop in replacement of the `JSONRenderer` using `orjson`, several times faster on the
+    big list pages. `str`, `int`, `float`, `dict`, `list` & `UUID` are encoded natively, the
+    rest (`Decimal`, `datetime`, lazy strings, querysets...) fall back to the DRF encoder, so
+    the output is the same as before.
+    """
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    # DRF's own conversions | Decimal as float, datetime as ECMA-262...
+    default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Overridden to encode using `orjson`."""
+
+        if data is None:
+            return b""
+
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=self.default, option=options)
+
+
+class AppStreamingRenderer(BaseRenderer):
+    """
+    Base of the export renderers, picked using `?format=`. The list views stream the rows
+    through `render_rows` instead of rendering a page | see `AppStreamingExportMixin`.
+    """
+
+    def render_rows(self, rows, serializer=None):
+        """
+        Yields the encoded rows, given an iterable of the serialized rows & the serializer
+        they are made by, if known.
+        """
+
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Renders the non streamed responses (ex: a single object) the same way."""
+
+        if data is None:
+            return b""
+
+        return b"".join(self.render_rows(data if isinstance(data, list) else [data]))
+
+
+class AppNDJSONRenderer(AppStreamingRenderer):
+    """Newline delimited JSON, one row per line."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render_rows(self, rows, serializer=None):
+        for row in rows:
+            yield orjson.dumps(row, default=AppJSONRenderer.default, option=AppJSONRenderer.options) + b"\n"
+
+
+class AppCSVRenderer(AppStreamingRenderer):
+    """
+    CSV with the columns of the serializer (of the first row if not given). Nested objects
+    are flattened to `parent.child` columns, lists & the other objects are written as JSON.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def get_fieldnames(self, serializer, prefix=""):
+        """Returns the columns of the rows of the serializer, nested serializers flattened."""
+
+        serializer = getattr(serializer, "child", serializer)
+        fieldnames = []
+        for field_name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            if isinstance(field, BaseSerializer) and not isinstance(field, ListSerializer):
+                fieldnames += self.get_fieldnames(field, f"{prefix}{field_name}.")
+            else:
+                fieldnames.append(f"{prefix}{field_name}")
+
+        return fieldnames
+
+    def flatten(self, row, prefix="", fieldnames=None):
+        """
+        Returns the row as a flat dict of the cell values. Given the `fieldnames`, the objects
+        that are a column of their own are not flattened.
+        """
+
+        cells = {}
+        for key, value in row.items():
+            if isinstance(value, dict) and not (fieldnames and f"{prefix}{key}" in fieldnames):
+                cells.update(self.flatten(value, f"{prefix}{key}.", fieldnames))
+            elif isinstance(value, (dict, list)):
+                cells[f"{prefix}{key}"] = orjson.dumps(
+                    value, default=AppJSONRenderer.default, option=AppJSONRenderer.options
+                ).decode()
+            else:
+                cells[f"{prefix}{key}"] = "" if value is None else value
+        return cells
+
+    def render_rows(self, rows, serializer=None):
+        buffer = io.StringIO()
+        writer = None
+        fieldnames = self.get_fieldnames(serializer) if serializer is not None else None
+        if fieldnames:
+            # from the serializer, a null nested object in the first row leaves out no columns
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore", restval="")
+            writer.writeheader()
+
+        for row in rows:
+            cells = self.flatten(row, fieldnames=fieldnames and set(fieldnames))
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(cells), extrasaction="ignore", restval="")
+                writer.writeheader()
+            writer.writerow(cells)
+
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            # the header alone, no rows
+            yield buffer.getvalue().encode(self.charset)
@@ -0,0 +1,61 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from apps.common.helpers import incr_cache_counter
+
+
+class ResponseCacheRegistry:
+    """
+    Keeps track of the views that cache their responses & the models these responses are
+    made of. A change (`post_save` or `post_delete`) on one of the models bumps the version
+    key of the dependent views, their cached responses are not read anymore.
+
+        response_cache_registry.register(PropertiesListViewSet, [Property, PropertyRoomType, ...])
+
+    Note: `queryset.update(...)` & `bulk_create(...)` do not send these signals, call
+    `invalidate(model)` after them.
+    """
+
+    def __init__(self):
+        # model: {view classes}
+        self.views = defaultdict(set)
+
+    @staticmethod
+    def get_version_key(view_class):
+        """Returns the cache key holding the current version of the responses of the view."""
+
+        return f"response-cache:{view_class.__module__}.{view_class.__qualname__}:version"
+
+    def register(self, view_class, models):
+        """Registers the view as depending on the given models."""
+
+        for model in models:
+            if model not in self.views:
+                post_save.connect(self.handle_change, sender=model, weak=False, dispatch_uid=self.get_uid(model))
+                post_delete.connect(self.handle_change, sender=model, weak=False, dispatch_uid=self.get_uid(model))
+            self.views[model].add(view_class)
+
+    @staticmethod
+    def get_uid(model):
+        return f"response-cache:{model._meta.label}"
+
+    def invalidate(self, model):
+        """Drops the cached responses of all the views depending on the model."""
+
+        for view_class in self.views.get(model, []):
+            incr_cache_counter(self.get_version_key(view_class))
+
+    def handle_change(self, sender, using=None, **kwargs):
+        """
+        Invalidates once the change is committed, else the old rows can be cached again. Queued
+        per change, an `incr` of the version key of each view (a queryset delete sends one
+        `post_delete` per row).
+        """
+
+        transaction.on_commit(partial(self.invalidate, sender), using=using)
+
+
+response_cache_registry = ResponseCacheRegistry()
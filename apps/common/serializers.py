@@ -1,5 +1,12 @@
+import copy
+import functools
+
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
 from rest_framework import serializers
 from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
 from rest_framework.serializers import ModelSerializer, Serializer
 
 from apps.common import model_fields
@@ -11,34 +18,59 @@ from apps.common.models import FileOnlyModel
 
 class CustomErrorMessagesMixin:
     """
-    Overrides the constructor of the serializer to add meaningful error
+    Overrides the fields of the serializer to add meaningful error
     messages to the serializer output. Also used to hide security
     related messages to the user.
+
+    The fields are built & customized once per serializer class, the
+    instances get a copy of them | see `get_fields`.
     """
 
     def get_display(self, field_name):
         return field_name.replace("_", " ")
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # adding custom error messages
-        for field_name, field in getattr(self, "fields", {}).items():
+    @staticmethod
+    def update_error_messages(field, error_messages):
+        """Updates the messages of the field, also kept in the init kwargs for the copies."""
+
+        field.error_messages.update(error_messages)
+        field._kwargs["error_messages"] = {**field._kwargs.get("error_messages", {}), **error_messages}
+
+    def set_custom_error_messages(self, fields):
+        """Adds the custom error messages to the given fields."""
+
+        for field_name, field in fields.items():
             if field.__class__.__name__ == "ManyRelatedField":
                 # many-to-many | uses foreign key field for children
-                field.error_messages.update(CUSTOM_ERRORS_MESSAGES["ManyRelatedField"])
-                field.child_relation.error_messages.update(CUSTOM_ERRORS_MESSAGES["PrimaryKeyRelatedField"])
+                self.update_error_messages(field, CUSTOM_ERRORS_MESSAGES["ManyRelatedField"])
+                self.update_error_messages(field.child_relation, CUSTOM_ERRORS_MESSAGES["PrimaryKeyRelatedField"])
             elif field.__class__.__name__ == "PrimaryKeyRelatedField":
                 # foreign-key
-                field.error_messages.update(CUSTOM_ERRORS_MESSAGES["PrimaryKeyRelatedField"])
+                self.update_error_messages(field, CUSTOM_ERRORS_MESSAGES["PrimaryKeyRelatedField"])
             else:
                 # other input-fields
-                field.error_messages.update(
+                self.update_error_messages(
+                    field,
                     {
                         "blank": f"Please enter your {self.get_display(field_name)}",
                         "null": f"Please enter your {self.get_display(field_name)}",
-                    }
+                    },
                 )
 
+    def get_fields(self):
+        """
+        Overridden to build the fields (model introspection & all) only once per class.
+        The instances get a deep copy, the same as the declared fields of the serializers.
+        """
+
+        cls = self.__class__
+        if "_prototype_fields" not in cls.__dict__:
+            fields = super().get_fields()
+            self.set_custom_error_messages(fields)
+            cls._prototype_fields = fields
+
+        return copy.deepcopy(cls._prototype_fields)
+
 
 class AppSerializer(CustomErrorMessagesMixin, Serializer):
     """
@@ -118,7 +150,10 @@ class AppWriteOnlyModelSerializer(AppModelSerializer):
     def create(self, validated_data):
         """Overridden to set the `created_by` field."""
 
+        # popped by the `ModelSerializer`, kept for the `get_meta_initial`
+        many_to_many = get_meta_initial_plan(self.__class__).get_many_to_many(validated_data)
         instance = super().create(validated_data=validated_data)
+        get_meta_initial_plan(self.__class__).set_many_to_many(instance, many_to_many)
 
         # setting the anonymous fields
         if hasattr(instance, "created_by") and not instance.created_by:
@@ -132,7 +167,9 @@ class AppWriteOnlyModelSerializer(AppModelSerializer):
     def update(self, instance, validated_data):
         """Overridden to set the `modified_by` field."""
 
+        many_to_many = get_meta_initial_plan(self.__class__).get_many_to_many(validated_data)
         instance = super().update(instance, validated_data)
+        get_meta_initial_plan(self.__class__).set_many_to_many(instance, many_to_many)
 
         # setting the anonymous fields
         if hasattr(instance, "modified_by"):
@@ -148,13 +185,14 @@ class AppWriteOnlyModelSerializer(AppModelSerializer):
 
         return self.validated_data[key] if key else self.validated_data
 
-    def __init__(self, *args, **kwargs):
-        # all fields are required
+    def get_extra_kwargs(self):
+        """Overridden to make all the fields required. Called once per class | see `get_fields`."""
+
+        extra_kwargs = super().get_extra_kwargs()
         for field in self.Meta.fields:
-            self.Meta.extra_kwargs.setdefault(field, {})
-            self.Meta.extra_kwargs[field]["required"] = True
+            extra_kwargs.setdefault(field, {})["required"] = True
 
-        super().__init__(*args, **kwargs)
+        return extra_kwargs
 
     class Meta(AppModelSerializer.Meta):
         model = None
@@ -249,6 +287,14 @@ class AppWriteOnlyModelSerializer(AppModelSerializer):
 
         return render_config
 
+    def get_render_config(self):
+        """
+        Returns the `get_dynamic_render_config`, built once per class & code revision.
+        Depends only on the serializer & the models | see `get_cached_render_config`.
+        """
+
+        return copy.deepcopy(get_cached_render_config(self.__class__, settings.APP_CODE_REVISION))
+
     def get_meta(self) -> dict:
         """
         Returns the meta details for `get_meta_for_create` & `get_meta_for_update`.
@@ -266,7 +312,7 @@ class AppWriteOnlyModelSerializer(AppModelSerializer):
         return {
             "meta": self.get_meta(),
             "initial": {},
-            "render_config": self.get_dynamic_render_config(),
+            "render_config": self.get_render_config(),
         }
 
     def get_meta_for_update(self):
@@ -278,60 +324,19 @@ class AppWriteOnlyModelSerializer(AppModelSerializer):
         return {
             "meta": self.get_meta(),
             "initial": self.get_meta_initial(),
-            "render_config": self.get_dynamic_render_config(),
+            "render_config": self.get_render_config(),
         }
 
     def get_meta_initial(self):
         """
         Returns the `initial` data for `self.get_meta_for_update`. This is
         used by the front-end for setting initial values.
-        """
-
-        instance = self.instance
-        initial = {}
-        for field_name in ["id", *self.fields.keys()]:
-            if field_name == "password":
-                initial[field_name] = None
-            else:
-                initial[field_name] = getattr(instance, field_name, None)
-
-        # simplify for FE
-        for k, v in initial.items():
-            # foreignkey
-            if hasattr(initial[k], "pk"):
-                initial[k] = v.pk
-
-            # not a model field
-            if not instance.__class__.get_model_field(k, None):
-                continue
-
-            field = self.Meta.model.get_model_field(k)
-            related_model = field.related_model
-
-            field_instance = getattr(self.instance, k)
-
-            # file url for fk instance
-            if related_model and issubclass(related_model, FileOnlyModel) and getattr(self.instance, k):
-                file_model_fields = related_model._meta.fields
-                for file_model_field in file_model_fields:
-                    if related_model._meta.get_field(file_model_field.name).__class__ in [AppImageField, AppFileField]:
-                        initial[k] = {
-                            "id": field_instance.id,
-                            file_model_field.name: getattr(field_instance, file_model_field.name).url,
-                        }
-
-            # file or image
-            if instance.__class__.get_model_field(k).__class__ in [AppImageField, AppFileField]:
-                initial[k] = getattr(instance, k).url if getattr(instance, k) else None
-
-            # many-to-many
-            if instance.__class__.get_model_field(k).many_to_many:
-                initial[k] = getattr(instance, k).values_list("pk", flat=True)
 
-            if instance.__class__.get_model_field(k).__class__ == model_fields.AppPhoneNumberField:
-                initial[k] = getattr(instance, k).raw_input if getattr(instance, k) else None
+        Uses the compiled `MetaInitialPlan` of the class, no queries if the file
+        relations & the many-to-many are loaded | see `MetaInitialPlan.apply`.
+        """
 
-        return initial
+        return get_meta_initial_plan(self.__class__).get_initial(self.instance)
 
 
 class AppCreateModelSerializer(AppWriteOnlyModelSerializer):
@@ -380,6 +385,144 @@ class AppReadOnlyModelSerializer(AppModelSerializer):
     def update(self, instance, validated_data):
         raise NotImplementedError
 
+    @classmethod
+    def get_values_plan(cls, sparse_fields=None):
+        """
+        Returns the compiled `ValuesSerializerPlan` of this serializer, the "fast mode".
+        None if the serializer needs the model instances. See `compile_values_serializer`.
+        """
+
+        return compile_values_serializer(cls, sparse_fields)
+
+    @classmethod
+    def serialize_queryset(cls, queryset):
+        """
+        Serializes the queryset to a list of dicts, same output as `cls(queryset, many=True).data`.
+        Uses the fast mode if supported, the regular serializer otherwise.
+        """
+
+        if plan := cls.get_values_plan():
+            return plan.serialize(plan.get_queryset(queryset))
+
+        return cls(queryset, many=True).data
+
+
+class MetaInitialPlan:
+    """
+    Compiled version of `AppWriteOnlyModelSerializer.get_meta_initial`. The model fields are
+    looked up once per serializer class, along with how each is to be read:
+
+        1. Foreign keys are read from the `attname` (`property_id`), no related object.
+        2. Foreign keys to a `FileOnlyModel` send the file url, need the related object
+           | `select_related`.
+        3. Many-to-many send the pks, from the prefetched objects | `prefetch_related`.
+        4. Files send the url & the phone numbers the raw input.
+    """
+
+    def __init__(self, serializer, model):
+        self.model = model
+        # (key, read(instance))
+        self.fields = []
+        self.select_related = []
+        self.prefetch_related = []
+
+        for field_name in ["id", *serializer.fields.keys()]:
+            self.fields.append((field_name, self.get_reader(field_name, model.get_model_field(field_name, None))))
+
+    @staticmethod
+    def as_pk(value):
+        """Related objects are sent as the pk."""
+
+        return value.pk if hasattr(value, "pk") else value
+
+    def get_reader(self, field_name, model_field):
+        """Returns the function that reads the initial value of the field from the instance."""
+
+        as_pk = self.as_pk
+
+        if field_name == "password":
+            return lambda instance: None
+
+        if not model_field:
+            return lambda instance: as_pk(getattr(instance, field_name, None))
+
+        related_model = model_field.related_model
+        file_field_names = [
+            _.name
+            for _ in (related_model._meta.fields if related_model else [])
+            if _.__class__ in [AppImageField, AppFileField]
+        ]
+
+        if model_field.concrete and related_model and issubclass(related_model, FileOnlyModel) and file_field_names:
+            self.select_related.append(field_name)
+            # the url of the last file field, same as before
+            file_field_name = file_field_names[-1]
+
+            def read_file_relation(instance):
+                related = getattr(instance, field_name)
+                return {"id": related.id, file_field_name: getattr(related, file_field_name).url} if related else None
+
+            return read_file_relation
+
+        if model_field.__class__ in [AppImageField, AppFileField]:
+            return lambda instance: getattr(instance, field_name).url if getattr(instance, field_name) else None
+
+        if model_field.many_to_many:
+            self.prefetch_related.append(field_name)
+            return lambda instance: [_.pk for _ in getattr(instance, field_name).all()]
+
+        if model_field.__class__ == model_fields.AppPhoneNumberField:
+            return lambda instance: getattr(instance, field_name).raw_input if getattr(instance, field_name) else None
+
+        if model_field.many_to_one and model_field.concrete and model_field.target_field.primary_key:
+            return lambda instance: getattr(instance, model_field.attname)
+
+        return lambda instance: as_pk(getattr(instance, field_name, None))
+
+    def get_initial(self, instance):
+        """Returns the `initial` of the given instance."""
+
+        return {key: read(instance) for key, read in self.fields}
+
+    def apply(self, queryset):
+        """Loads the related objects needed by the plan, along with the queryset."""
+
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+
+        return queryset
+
+    def get_many_to_many(self, validated_data):
+        """Returns the many-to-many of the validated data, the related objects."""
+
+        return {_: validated_data[_] for _ in self.prefetch_related if _ in validated_data}
+
+    def set_many_to_many(self, instance, many_to_many):
+        """Sets the many-to-many just saved as prefetched on the instance, same as `apply`."""
+
+        for field_name, related_objects in many_to_many.items():
+            queryset = getattr(instance, field_name).all()
+            queryset._result_cache = list(related_objects)
+            queryset._prefetch_done = True
+            instance._prefetched_objects_cache = getattr(instance, "_prefetched_objects_cache", {})
+            instance._prefetched_objects_cache[self.model.get_model_field(field_name).name] = queryset
+
+
+@functools.cache
+def get_meta_initial_plan(serializer_class):
+    """Returns the `MetaInitialPlan` of the serializer class. Built once per class."""
+
+    return MetaInitialPlan(serializer_class(), serializer_class.Meta.model)
+
+
+@functools.cache
+def get_cached_render_config(serializer_class, revision):
+    """Returns the render config of the serializer class. Kept in the process, per code `revision`."""
+
+    return serializer_class().get_dynamic_render_config()
+
 
 def get_app_read_only_serializer(
     meta_model,
@@ -430,6 +573,220 @@ def simple_serialize_queryset(fields, queryset):
     return queryset.only(*fields).values(*fields)
 
 
+class ValuesSerializerNotSupported(Exception):
+    """The serializer reads something other than the model fields, needs the model instances."""
+
+
+class ValuesAttribute:
+    """Stand-in instance for the model field descriptors, see `ValuesSerializerPlan`."""
+
+
+class ValuesSerializerPlan:
+    """
+    Compiled version of an `AppReadOnlyModelSerializer`. Like `simple_serialize_queryset`, the
+    rows are read using `.values()` & never turned in to model instances:
+
+        1. Model fields & nested serializers on forward relations are a single projection,
+           the values are converted using the same `to_representation` of the fields.
+        2. Nested `many=True` serializers & many related fields take one `.values()` query
+           per relation, for all the rows at once.
+
+    Built by `compile_values_serializer`, raises `ValuesSerializerNotSupported` for method
+    fields, properties, file fields & the like.
+    """
+
+    def __init__(self, serializer, model, prefix=""):
+        self.model = model
+        self.pk_key = f"{prefix}{model._meta.pk.attname}"
+        self.projection = [self.pk_key]
+        # (field_name, convert(row, related)) | `related` holds the many relation results
+        self.fields = []
+        # (key, model field, `ValuesSerializerPlan` of the related rows or None for the pks)
+        self.relations = []
+
+        for field_name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            if field.source == "*" or isinstance(field, serializers.SerializerMethodField):
+                raise ValuesSerializerNotSupported(field_name)
+
+            model_field = model.get_model_field(field.source, fallback=None) if len(field.source_attrs) == 1 else None
+            if not model_field:
+                raise ValuesSerializerNotSupported(field_name)
+
+            self.fields.append((field_name, self.get_converter(field, model_field, prefix)))
+
+    def get_converter(self, field, model_field, prefix):
+        """Returns the function that converts the row to the representation of the field."""
+
+        key = f"{prefix}{model_field.name}"
+
+        if isinstance(field, serializers.ListSerializer) or isinstance(field, serializers.ManyRelatedField):
+            if not (model_field.one_to_many or model_field.many_to_many):
+                raise ValuesSerializerNotSupported(key)
+
+            plan = None
+            if isinstance(field, serializers.ListSerializer):
+                plan = ValuesSerializerPlan(field.child, model_field.related_model)
+                self.relations.append((key, model_field, plan))
+                return lambda row, related: [
+                    plan.to_representation(_, related) for _ in related[key].get(row[self.pk_key], [])
+                ]
+
+            self.relations.append((key, model_field, None))
+            child_relation = field.child_relation
+            return lambda row, related: [
+                child_relation.to_representation(PKOnlyObject(_)) for _ in related[key].get(row[self.pk_key], [])
+            ]
+
+        if isinstance(field, serializers.BaseSerializer):
+            if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                raise ValuesSerializerNotSupported(key)
+
+            plan = ValuesSerializerPlan(field, model_field.related_model, prefix=f"{key}__")
+            if plan.relations:
+                raise ValuesSerializerNotSupported(key)
+
+            self.projection.extend(plan.projection)
+            return lambda row, related: plan.to_representation(row, related) if row[plan.pk_key] is not None else None
+
+        if model_field.is_relation:
+            if not isinstance(field, serializers.PrimaryKeyRelatedField) or not model_field.concrete:
+                raise ValuesSerializerNotSupported(key)
+
+            self.projection.append(key)
+            return (
+                lambda row, related: field.to_representation(PKOnlyObject(row[key])) if row[key] is not None else None
+            )
+
+        if isinstance(model_field, models.FileField):
+            raise ValuesSerializerNotSupported(key)
+
+        self.projection.append(key)
+        descriptor = model_field.model.__dict__.get(model_field.attname)
+        if not isinstance(descriptor, DeferredAttribute):
+            # custom descriptors convert the db value on the instance | ex: phone numbers
+            def _convert(value):
+                holder = ValuesAttribute()
+                descriptor.__set__(holder, value)
+                return descriptor.__get__(holder, model_field.model)
+
+            return lambda row, related: field.to_representation(_convert(row[key])) if row[key] is not None else None
+
+        return lambda row, related: field.to_representation(row[key]) if row[key] is not None else None
+
+    def get_queryset(self, queryset, fields=()):
+        """Returns the `.values()` queryset of the projection & the given extra `fields`."""
+
+        return queryset.prefetch_related(None).values(
+            *self.projection, *[_ for _ in fields if _ not in self.projection]
+        )
+
+    def get_related(self, rows):
+        """Returns {key: {pk: [related rows or pks]}} of the many relations for the given rows."""
+
+        pks = [_[self.pk_key] for _ in rows]
+        related = {}
+        for key, model_field, plan in self.relations:
+            if model_field.one_to_many:
+                parent_lookup = model_field.field.name
+            elif model_field.concrete:
+                parent_lookup = model_field.related_query_name()
+            else:
+                parent_lookup = model_field.field.name
+
+            queryset = model_field.related_model._default_manager.filter(**{f"{parent_lookup}__in": pks})
+            queryset = queryset.values(*(plan.projection if plan else [model_field.related_model._meta.pk.attname]))
+            queryset = queryset.annotate(_parent=models.F(parent_lookup))
+            children = list(queryset)
+
+            grouped = related[key] = {}
+            nested = plan.get_related(children) if plan and plan.relations else {}
+            for child in children:
+                value = {**child, "_related": nested} if plan else child[model_field.related_model._meta.pk.attname]
+                grouped.setdefault(child["_parent"], []).append(value)
+
+        return related
+
+    def to_representation(self, row, related):
+        """Returns the representation of a single row."""
+
+        related = row.get("_related", related)
+        return {field_name: convert(row, related) for field_name, convert in self.fields}
+
+    def serialize(self, rows):
+        """Serializes the given `.values()` rows (or queryset) to a list of dicts."""
+
+        rows = list(rows)
+        related = self.get_related(rows) if self.relations else {}
+        return [self.to_representation(_, related) for _ in rows]
+
+
+def parse_sparse_fields(fields):
+    """
+    Parses the `?fields=` of the request to a (hashable) sparse fieldset.
+
+        fields=id,name,related_property_room_types.price_per_month
+        -> (("id", None), ("name", None), ("related_property_room_types", (("price_per_month", None),)))
+
+    `None` keeps the field as is, a nested field given by its name alone is kept as a whole.
+    Returns None if `fields` is not given, nothing is to be trimmed.
+    """
+
+    if not fields:
+        return None
+
+    tree = {}
+    for path in [_.strip() for _ in fields.split(",") if _.strip()]:
+        node = tree
+        *parents, name = path.split(".")
+        for parent in parents:
+            if parent in node and node[parent] is None:
+                # the parent is already requested as a whole
+                break
+            node = node.setdefault(parent, {})
+        else:
+            node[name] = None
+
+    def freeze(node):
+        return tuple(sorted((key, freeze(value) if value else None) for key, value in node.items()))
+
+    return freeze(tree)
+
+
+def trim_serializer_fields(serializer, sparse_fields):
+    """Removes the fields not in the `sparse_fields` (see `parse_sparse_fields`) from the serializer."""
+
+    serializer = getattr(serializer, "child", serializer)
+    sparse_fields = dict(sparse_fields)
+
+    for field_name in list(serializer.fields):
+        if field_name not in sparse_fields:
+            serializer.fields.pop(field_name)
+        elif sparse_fields[field_name]:
+            nested = getattr(serializer.fields[field_name], "child", serializer.fields[field_name])
+            if isinstance(nested, serializers.BaseSerializer):
+                trim_serializer_fields(nested, sparse_fields[field_name])
+
+    return serializer
+
+
+# bounded, the sparse fieldsets come from the clients
+@functools.lru_cache(maxsize=256)
+def compile_values_serializer(serializer_class, sparse_fields=None):
+    """Returns the `ValuesSerializerPlan` of the serializer class, None if not supported."""
+
+    serializer = serializer_class()
+    if sparse_fields:
+        trim_serializer_fields(serializer, sparse_fields)
+
+    try:
+        return ValuesSerializerPlan(serializer, serializer_class.Meta.model)
+    except ValuesSerializerNotSupported:
+        return None
+
+
 def simple_serialize_instance(instance, keys: list, parent_data: dict = None, display=None) -> dict:
     """
     Given a single object/instance, this will serialize the same.
@@ -0,0 +1,409 @@
+import heapq
+import math
+import os
+import tempfile
+import threading
+
+import numpy as np
+from django.core.cache import cache
+
+from apps.common.helpers import EARTH_RADIUS_KM, haversine_vectorized, incr_cache_counter
+
+# points per leaf, checked in one vectorized pass instead of walking further
+SPATIAL_INDEX_LEAF_SIZE = 32
+
+# slack on the chord distances, the exact filtering is done on the haversine distances
+CHORD_TOLERANCE = 1e-9
+
+
+def to_unit_vectors(latitudes, longitudes):
+    """
+    Converts the given lat/long degrees to 3d points on the unit sphere. The straight line
+    (chord) distance between these points grows with the great circle distance, so a plain
+    euclidean k-d tree over them answers haversine queries without any edge cases at the
+    poles or at the 180th meridian.
+    """
+
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    cos_latitudes = np.cos(latitudes)
+    return np.column_stack((cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes), np.sin(latitudes)))
+
+
+def km_to_chord(distance_km):
+    """Great circle distance in km to the chord distance on the unit sphere."""
+
+    return 2 * math.sin(min(distance_km / (2 * EARTH_RADIUS_KM), math.pi / 2))
+
+
+def build_kd_tree(points):
+    """
+    Returns the order in which the given points form an implicit k-d tree. The tree needs no
+    node objects, the median of every range [lo, hi) is the node at (lo + hi) // 2, split on
+    the axis `depth % 3`, with the left and right subtrees on either side of it.
+    """
+
+    order = np.arange(len(points))
+    stack = [(0, len(points), 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi - lo <= SPATIAL_INDEX_LEAF_SIZE:
+            continue
+
+        mid, segment = (lo + hi) // 2, order[lo:hi]
+        order[lo:hi] = segment[np.argpartition(points[segment, depth % 3], mid - lo)]
+        stack.extend([(lo, mid, depth + 1), (mid + 1, hi, depth + 1)])
+
+    return order
+
+
+class SnapshotPayloads:
+    """Read only payloads of a snapshot. Decoded from the fixed width byte fields on access."""
+
+    def __init__(self, array, payload_fields):
+        self.array = array
+        self.payload_fields = payload_fields
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        row = self.array[index]
+        return {_: row[f"payload_{_}"].decode() for _ in self.payload_fields}
+
+
+class SpatialIndexState:
+    """
+    The arrays of a single build, all ordered as the implicit k-d tree. Never mutated, changes
+    create a new state. So readers can use it without any locks.
+
+    `changes` maps the changed ids to (point, latitude, longitude, payload) or None if removed.
+    """
+
+    def __init__(self, ids, points, latitudes, longitudes, payloads, changes=None):
+        self.ids = ids
+        self.points = points
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.payloads = payloads
+        self.changes = changes or {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds the state from the given (id, latitude, longitude, payload) rows."""
+
+        rows = list(rows)
+        ids = np.fromiter((_[0] for _ in rows), dtype=np.int64, count=len(rows))
+        latitudes = np.fromiter((_[1] for _ in rows), dtype=np.float64, count=len(rows))
+        longitudes = np.fromiter((_[2] for _ in rows), dtype=np.float64, count=len(rows))
+        points = to_unit_vectors(latitudes, longitudes).reshape(-1, 3)
+        order = build_kd_tree(points)
+
+        return cls(
+            ids=ids[order],
+            points=points[order],
+            latitudes=latitudes[order],
+            longitudes=longitudes[order],
+            payloads=[rows[_][3] for _ in order.tolist()],
+        )
+
+    def get_rows(self):
+        """Returns the (id, latitude, longitude, payload) rows, including the changes."""
+
+        for index, _id in enumerate(self.ids.tolist()):
+            if _id not in self.changes:
+                yield _id, float(self.latitudes[index]), float(self.longitudes[index]), self.payloads[index]
+
+        for _id, change in self.changes.items():
+            if change:
+                yield _id, change[1], change[2], change[3]
+
+
+class SpatialIndex:
+    """
+    In-process index of (id, latitude, longitude, payload) rows that answers within-radius and
+    k-nearest queries in O(log n). The coordinates are held as compact numpy arrays ordered
+    as an implicit k-d tree over unit sphere vectors.
+
+    Changes after the build are kept as a small overlay which is scanned along with the tree,
+    once the overlay grows past `rebuild_threshold` it is merged & the tree is rebuilt. This
+    way single row changes never need the full data set again.
+
+    Source of the rows:
+        1. `snapshot_path`  : If the file exists, its arrays are memory mapped read only. All the
+                              processes share the same pages. A newer file is picked up by its
+                              mtime, see `write_snapshot`.
+        2. `loader`         : Otherwise every process builds its own copy. When `version_key` is
+                              given, changes bump a shared version in the cache and the other
+                              processes reload once they notice.
+
+    Usage:
+        index = SpatialIndex(loader=lambda: [(1, 12.97, 77.59, {"name": "..."}), ...])
+        index.within_radius(12.9, 77.5, radius_km=10)
+        index.nearest(12.9, 77.5, k=5)
+    """
+
+    def __init__(self, loader=None, rebuild_threshold=256, version_key=None, snapshot_path=None, payload_fields=()):
+        self.loader = loader
+        self.rebuild_threshold = rebuild_threshold
+        self.version_key = version_key
+        self.snapshot_path = snapshot_path
+        self.payload_fields = payload_fields
+        self._lock = threading.Lock()
+        self._state = None
+        self._version = None
+
+    @property
+    def is_loaded(self):
+        """Returns if the index is built, unloaded indexes are built on first use."""
+
+        return self._state is not None
+
+    def get_state(self):
+        """Returns the current `SpatialIndexState`. Builds or reloads the index if needed."""
+
+        version = self.get_version()
+        if self._state is None or self._version != version:
+            with self._lock:
+                if self._state is None or self._version != version:
+                    self._state = self.read_snapshot() if version[0] == "snapshot" else self.read_loader()
+                    self._version = version
+
+        return self._state
+
+    def get_version(self):
+        """
+        Returns the version of the source data as ("snapshot", mtime) or ("loader", version).
+        The loader version is always 0 without a `version_key`.
+        """
+
+        if self.snapshot_path:
+            try:
+                return "snapshot", os.stat(self.snapshot_path).st_mtime_ns
+            except FileNotFoundError:
+                pass
+
+        return "loader", cache.get(self.version_key, 0) if self.version_key else 0
+
+    def bump_shared_version(self):
+        """Marks the data as changed for the other processes. Returns the new version."""
+
+        return incr_cache_counter(self.version_key) if self.version_key else 0
+
+    def read_loader(self):
+        """Builds the state from the `loader`."""
+
+        return SpatialIndexState.from_rows(self.loader() if self.loader else [])
+
+    def read_snapshot(self):
+        """Memory maps the `snapshot_path`. Nothing is copied in to the process."""
+
+        array = np.load(self.snapshot_path, mmap_mode="r")
+        return SpatialIndexState(
+            ids=array["id"],
+            points=array["point"],
+            latitudes=array["latitude"],
+            longitudes=array["longitude"],
+            payloads=SnapshotPayloads(array, self.payload_fields),
+        )
+
+    def write_snapshot(self, rows):
+        """
+        Builds the index from the given rows & writes it to the `snapshot_path`. The file is
+        replaced atomically, the processes pick it up on their next query. Returns the count.
+        """
+
+        state = SpatialIndexState.from_rows(rows)
+        payloads = {_: [str(p.get(_) or "").encode() for p in state.payloads] for _ in self.payload_fields}
+        array = np.empty(
+            len(state.ids),
+            dtype=[
+                ("id", np.int64),
+                ("latitude", np.float64),
+                ("longitude", np.float64),
+                ("point", np.float64, (3,)),
+                *[(f"payload_{k}", f"S{max(map(len, v), default=1) or 1}") for k, v in payloads.items()],
+            ],
+        )
+        array["id"], array["point"] = state.ids, state.points
+        array["latitude"], array["longitude"] = state.latitudes, state.longitudes
+        for k, v in payloads.items():
+            array[f"payload_{k}"] = v
+
+        directory = os.path.dirname(self.snapshot_path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".npy", delete=False) as file:
+            np.save(file, array)
+        # readable by the workers of other users as well, temp files are private by default
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, self.snapshot_path)
+
+        return len(array)
+
+    def build(self, rows):
+        """Replaces the index with the given (id, latitude, longitude, payload) rows."""
+
+        version = self.get_version()
+        state = SpatialIndexState.from_rows(rows)
+        with self._lock:
+            self._state, self._version = state, version
+
+    def reset(self):
+        """Drops the index, it is built again on next use."""
+
+        with self._lock:
+            self._state = None
+            self._version = None
+
+    def upsert(self, _id, latitude, longitude, payload=None):
+        """Adds or updates a single row. Ignored if the index is not built yet."""
+
+        point = to_unit_vectors([latitude], [longitude])[0]
+        self._apply_change(_id, (point, float(latitude), float(longitude), payload))
+
+    def remove(self, _id):
+        """Removes a single row. Ignored if the index is not built yet."""
+
+        self._apply_change(_id, None)
+
+    def _apply_change(self, _id, change):
+        """Records the change in the overlay, the state is replaced & never mutated for readers."""
+
+        shared_version = self.bump_shared_version()
+        with self._lock:
+            if self._state is None:
+                return
+
+            source, version = self._version
+            if source == "loader" and version is not None and shared_version == version + 1:
+                # no other process changed the data in between, the overlay is up to date
+                self._version = source, shared_version
+
+            state = self._state
+            changes = {**state.changes, _id: change}
+            if len(changes) <= max(self.rebuild_threshold, len(state.ids) // 20):
+                self._state = SpatialIndexState(
+                    state.ids, state.points, state.latitudes, state.longitudes, state.payloads, changes
+                )
+            else:
+                # merge the overlay & rebuild the tree
+                self._state = SpatialIndexState.from_rows(
+                    SpatialIndexState(
+                        state.ids, state.points, state.latitudes, state.longitudes, state.payloads, changes
+                    ).get_rows()
+                )
+
+    def _get_results(
+        self, state, indexes, changes, latitude, longitude, radius_km, min_distance_km, with_coordinates=False
+    ):
+        """
+        Returns the (distance_km, id, payload) of the given tree indexes and overlay changes,
+        filtered on the exact haversine distance. Distances are calculated in one pass. The
+        (latitude, longitude) of the rows are appended with `with_coordinates`.
+        """
+
+        indexes = [_ for _ in indexes if int(state.ids[_]) not in state.changes]
+        latitudes = np.concatenate([state.latitudes[indexes], [_[1] for _ in changes.values()]])
+        longitudes = np.concatenate([state.longitudes[indexes], [_[2] for _ in changes.values()]])
+        ids = [*state.ids[indexes].tolist(), *changes.keys()]
+        distances = haversine_vectorized(float(latitude), float(longitude), latitudes, longitudes).tolist()
+        coordinates = zip(latitudes.tolist(), longitudes.tolist()) if with_coordinates else [()] * len(ids)
+
+        return sorted(
+            (distance, _id, state.payloads[index] if position < len(indexes) else changes[_id][3], *coordinate)
+            for position, (index, _id, distance, coordinate) in enumerate(
+                zip([*indexes, *[None] * len(changes)], ids, distances, coordinates)
+            )
+            if min_distance_km <= distance <= radius_km
+        )
+
+    def within_radius(self, latitude, longitude, radius_km, min_distance_km=0, with_coordinates=False):
+        """
+        Returns the rows between `min_distance_km` & `radius_km` of the given point as
+        (distance_km, id, payload), nearest first. With `with_coordinates` the rows are
+        (distance_km, id, payload, latitude, longitude).
+        """
+
+        state = self.get_state()
+        points, query = state.points, to_unit_vectors([float(latitude)], [float(longitude)])[0]
+        max_chord = km_to_chord(radius_km) + CHORD_TOLERANCE
+        min_chord = km_to_chord(min_distance_km) - CHORD_TOLERANCE
+
+        found = []
+        stack = [(0, len(state.ids), 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= SPATIAL_INDEX_LEAF_SIZE:
+                chords = np.sqrt(((points[lo:hi] - query) ** 2).sum(axis=1))
+                found.extend((np.nonzero((chords <= max_chord) & (chords >= min_chord))[0] + lo).tolist())
+                continue
+
+            mid, axis = (lo + hi) // 2, depth % 3
+            if min_chord <= math.dist(points[mid], query) <= max_chord:
+                found.append(mid)
+
+            diff = query[axis] - points[mid, axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff <= 0 else ((mid + 1, hi), (lo, mid))
+            stack.append((*near, depth + 1))
+            if abs(diff) <= max_chord:
+                stack.append((*far, depth + 1))
+
+        changes = {k: v for k, v in state.changes.items() if v}
+        return self._get_results(
+            state, found, changes, latitude, longitude, radius_km, min_distance_km, with_coordinates
+        )
+
+    def nearest(self, latitude, longitude, k=1, max_distance_km=None, min_distance_km=0):
+        """
+        Returns the `k` nearest rows to the given point as (distance_km, id, payload),
+        nearest first. Optionally limited to `max_distance_km`.
+        """
+
+        state = self.get_state()
+        points, query = state.points, to_unit_vectors([float(latitude)], [float(longitude)])[0]
+        max_distance_km = max_distance_km if max_distance_km is not None else math.pi * EARTH_RADIUS_KM
+        max_chord = km_to_chord(max_distance_km) + CHORD_TOLERANCE
+        min_chord = km_to_chord(min_distance_km) - CHORD_TOLERANCE
+
+        # max heap of the best k as (-chord, tree index or changed id, is_change)
+        best = []
+
+        def _consider(chord, key, is_change=False):
+            if min_chord <= chord <= max_chord:
+                if len(best) < k:
+                    heapq.heappush(best, (-chord, key, is_change))
+                elif chord < -best[0][0]:
+                    heapq.heapreplace(best, (-chord, key, is_change))
+
+        def _worst_chord():
+            return -best[0][0] if len(best) == k else max_chord
+
+        for _id, change in state.changes.items():
+            if change:
+                _consider(math.dist(change[0], query), _id, True)
+
+        stack = [(0, len(state.ids), 0, 0.0)]
+        while stack and k > 0:
+            lo, hi, depth, bound = stack.pop()
+            if bound > _worst_chord():
+                continue
+
+            if hi - lo <= SPATIAL_INDEX_LEAF_SIZE:
+                chords = np.sqrt(((points[lo:hi] - query) ** 2).sum(axis=1))
+                for index in np.nonzero(chords <= _worst_chord())[0].tolist():
+                    if int(state.ids[lo + index]) not in state.changes:
+                        _consider(float(chords[index]), lo + index)
+                continue
+
+            mid, axis = (lo + hi) // 2, depth % 3
+            if int(state.ids[mid]) not in state.changes:
+                _consider(math.dist(points[mid], query), mid)
+
+            diff = query[axis] - points[mid, axis]
+            near, far = ((lo, mid), (mid + 1, hi)) if diff <= 0 else ((mid + 1, hi), (lo, mid))
+            # far side is pushed first, so that the near side is walked first
+            stack.append((*far, depth + 1, max(bound, abs(diff))))
+            stack.append((*near, depth + 1, bound))
+
+        indexes = [key for _, key, is_change in best if not is_change]
+        changes = {key: state.changes[key] for _, key, is_change in best if is_change}
+        return self._get_results(state, indexes, changes, latitude, longitude, max_distance_km, min_distance_km)
@@ -11,3 +11,39 @@ def send_sms(phone_number, message):
     client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
 
     client.messages.create(body=message, from_=settings.TWILIO_PHONE_NUMBER, to=phone_number)
+
+
+@shared_task
+def write_property_geo_snapshot():
+    """
+    Generates the shared coordinate snapshot of the properties, so that all the processes
+    see the changes. Scheduled by the `Property` signals.
+    """
+
+    from apps.properties.utils import write_property_snapshot
+
+    write_property_snapshot()
+
+
+@shared_task
+def sync_bed_occupancy():
+    """
+    Takes the beds of the stays starting today & frees the beds of the ended stays, as per the
+    bed reservations. Scheduled daily on the celery beat.
+    """
+
+    from apps.properties.utils import sync_bed_occupancy
+
+    return sync_bed_occupancy()
+
+
+@shared_task
+def roll_up_property_bed_counters():
+    """
+    Sets the bed counters of the properties to the sums of their room types, the
+    allocations only update the room types. Scheduled on the celery beat.
+    """
+
+    from apps.properties.utils import roll_up_property_bed_counters
+
+    return roll_up_property_bed_counters()
@@ -1,6 +1,9 @@
 import contextlib
+import hashlib
 from contextlib import suppress
 
+from django.conf import settings
+from django.utils.http import parse_etags
 from rest_framework import permissions, status
 from rest_framework.exceptions import MethodNotAllowed, NotFound
 from rest_framework.generics import CreateAPIView
@@ -9,6 +12,7 @@ from rest_framework.status import is_success
 from rest_framework.views import APIView
 
 from apps.common.config import API_RESPONSE_ACTION_CODES
+from apps.common.serializers import parse_sparse_fields, trim_serializer_fields
 
 
 class NonAuthenticatedAPIMixin:
@@ -28,6 +32,14 @@ class AppViewMixin:
 
     get_object_model = None
 
+    # sparse fieldsets | ?fields=id,name,related_property_room_types.price_per_month
+    sparse_fields_query_param = "fields"
+    sparse_fields_actions = ["list", "retrieve"]
+
+    # conditional get, opted in per view | etag_actions = ["list", "retrieve"] | 304 on `If-None-Match`
+    # the actions are to be cached as well, see `get_etag_validator`
+    etag_actions = []
+
     def get_request(self):
         """Returns the request."""
 
@@ -63,6 +75,75 @@ class AppViewMixin:
 
         return super().get_object()
 
+    def get_sparse_fields(self):
+        """
+        Returns the sparse fieldset requested using the `fields` query param,
+        None if all the fields are needed. See `apps.common.serializers.parse_sparse_fields`.
+        """
+
+        if getattr(self, "action", None) not in self.sparse_fields_actions:
+            return None
+
+        return parse_sparse_fields(self.get_request().query_params.get(self.sparse_fields_query_param))
+
+    def get_serializer(self, *args, **kwargs):
+        """Overridden to trim the serializer fields to the requested sparse fieldset."""
+
+        serializer = super().get_serializer(*args, **kwargs)
+        if sparse_fields := self.get_sparse_fields():
+            trim_serializer_fields(serializer, sparse_fields)
+
+        return serializer
+
+    def get_etag_validator(self):
+        """
+        Returns what the `ETag` is made of, nothing is queried for it: the response cache key,
+        holds the version of the cached responses. None if the view does not cache the action,
+        the `etag_actions` are to be cached | see `AppResponseCacheMixin`.
+        """
+
+        if getattr(self, "cache_responses", False) and self.action in self.cache_response_actions:
+            return self.get_response_cache_key()
+
+        return None
+
+    def get_etag(self):
+        """
+        Returns the `ETag` of the response, along with the request itself. None if not
+        applicable | see `get_etag_validator`.
+        """
+
+        if getattr(self, "action", None) not in self.etag_actions or self.get_object_model:
+            return None
+
+        if (validator := self.get_etag_validator()) is None:
+            return None
+
+        request = self.get_request()
+        user = self.get_authenticated_user()
+        key = [
+            settings.APP_CODE_REVISION,
+            self.__class__.__qualname__,
+            request.get_full_path(),
+            getattr(request, "accepted_media_type", None),
+            user and user.pk,
+            validator,
+        ]
+        return f'W/"{hashlib.md5(repr(key).encode()).hexdigest()}"'
+
+    def get_not_modified_response(self, etag):
+        """Returns the 304 response if the client already has the `etag`, None otherwise."""
+
+        if not etag or not (if_none_match := self.get_request().headers.get("If-None-Match")):
+            return None
+
+        etags = parse_etags(if_none_match)
+        # weak comparison, as per the spec for `If-None-Match`
+        if "*" in etags or etag.removeprefix("W/") in [_.removeprefix("W/") for _ in etags]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        return None
+
     def send_error_response(self, data=None):
         """Central function to send error response."""
 
@@ -98,19 +179,39 @@ class AppViewMixin:
         return self.get_app_response_schema(super().handle_exception(exc), action_code=action_code)
 
     def list(self, request, *args, **kwargs):
-        """Overridden to maintain applications response schema."""
+        """Overridden to maintain applications response schema & to answer the conditional requests."""
+
+        etag = self.get_etag()
+        if not_modified_response := self.get_not_modified_response(etag):
+            return not_modified_response
 
         with suppress(AttributeError):
-            return self.get_app_response_schema(super().list(request, *args, **kwargs))
+            response = self.get_app_response_schema(super().list(request, *args, **kwargs))
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+            if etag:
+                response["ETag"] = etag
+            return response
 
         # not defined in view, not allowed
         raise MethodNotAllowed(method=self.get_request().method)
 
     def retrieve(self, request, *args, **kwargs):
-        """Overridden to maintain applications response schema."""
+        """Overridden to maintain applications response schema & to answer the conditional requests."""
+
+        etag = self.get_etag()
+        if not_modified_response := self.get_not_modified_response(etag):
+            return not_modified_response
 
         with suppress(AttributeError):
-            return self.get_app_response_schema(super().retrieve(request, *args, **kwargs))
+            response = self.get_app_response_schema(super().retrieve(request, *args, **kwargs))
+            if response.status_code != status.HTTP_200_OK:
+                return response
+
+            if etag:
+                response["ETag"] = etag
+            return response
 
         # not defined in view, not allowed
         raise MethodNotAllowed(method=self.get_request().method)
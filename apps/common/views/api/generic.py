@@ -1,7 +1,14 @@
+import functools
+import hashlib
+import itertools
 import logging
+from urllib.parse import urlencode
 
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, parsers
+from rest_framework import filters, parsers, status
 from rest_framework.decorators import action
 from rest_framework.mixins import (
     CreateModelMixin,
@@ -10,16 +17,30 @@ from rest_framework.mixins import (
     RetrieveModelMixin,
     UpdateModelMixin,
 )
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import GenericViewSet
 
+from apps.common.filters import AppSearchFilter
 from apps.common.helpers import custom_capitalize
-from apps.common.pagination import AppPagination
-from apps.common.serializers import AppModelSerializer
+from apps.common.pagination import APP_PAGINATION_CLASSES, AppPagination
+from apps.common.prefetch import QuerysetPlan, get_queryset_plan
+from apps.common.renderers import AppCSVRenderer, AppJSONRenderer, AppNDJSONRenderer, AppStreamingRenderer
+from apps.common.response_cache import response_cache_registry
+from apps.common.serializers import AppModelSerializer, AppWriteOnlyModelSerializer, get_meta_initial_plan
 from apps.common.views.api.base import AppCreateAPIView, AppViewMixin
+from apps.properties.choices import RoleTypeChoices
 
 logger = logging.getLogger(__name__)
 
 
+@functools.cache
+def get_table_columns(serializer_class, revision):
+    """Returns the default table columns of the serializer class. Kept in the process, per code `revision`."""
+
+    return {field: custom_capitalize(field) for field in serializer_class.Meta.fields}
+
+
 class AppGenericViewSet(GenericViewSet):
     """
     Applications version of the `GenericViewSet`. Overridden to implement
@@ -50,8 +71,268 @@ class AppGenericViewSet(GenericViewSet):
     pass
 
 
+class AppQuerysetPlanMixin:
+    """
+    Loads everything the serializer needs along with the queryset, instead of a query per
+    row & relation. Applied on the `list` & `retrieve` actions.
+
+        prefetch_plan = None    # derived from the (sparse) serializer | see apps.common.prefetch
+        prefetch_plan = False   # disabled
+        prefetch_plan = {       # explicit
+            "select_related": ["property"],
+            "prefetch_related": ["related_beds"],
+            "only": ["id", "name", "property__name"],
+        }
+    """
+
+    prefetch_plan = None
+    prefetch_plan_actions = ["list", "retrieve"]
+
+    def get_queryset_plan(self):
+        """Returns the `QuerysetPlan` for the current request, None if not to be applied."""
+
+        if self.prefetch_plan is False or self.action not in self.prefetch_plan_actions:
+            return None
+
+        if self.prefetch_plan is None:
+            return get_queryset_plan(self.get_serializer_class(), self.get_sparse_fields())
+
+        plan = QuerysetPlan(self.get_serializer_class().Meta.model)
+        plan.select_related = self.prefetch_plan.get("select_related", [])
+        plan.prefetches = [(_, None) for _ in self.prefetch_plan.get("prefetch_related", [])]
+        plan.only.update(self.prefetch_plan.get("only", []))
+        plan.use_only = "only" in self.prefetch_plan
+        return plan
+
+    def filter_queryset(self, queryset):
+        """Overridden to apply the prefetch plan, used by both `list` & `get_object`."""
+
+        queryset = super().filter_queryset(queryset)
+        plan = self.get_queryset_plan()
+        return plan.apply(queryset) if plan else queryset
+
+
+class AppValuesListMixin:
+    """
+    Lists using the "fast mode" of the `AppReadOnlyModelSerializer` when `fast_serialization`
+    is set. The page is read using `.values()` & serialized without any model instances, the
+    output is the same. Falls back to the regular `list` if the serializer does not support it.
+    """
+
+    fast_serialization = False
+
+    def get_values_plan(self):
+        """Returns the `ValuesSerializerPlan` of the serializer, None if not enabled or supported."""
+
+        serializer_class = self.get_serializer_class()
+        if not self.fast_serialization or not hasattr(serializer_class, "get_values_plan"):
+            return None
+
+        return serializer_class.get_values_plan(self.get_sparse_fields())
+
+    def list(self, request, *args, **kwargs):
+        """Overridden to serialize the `.values()` of the page when enabled."""
+
+        if not (plan := self.get_values_plan()):
+            return super().list(request, *args, **kwargs)
+
+        queryset = plan.get_queryset(
+            self.filter_queryset(self.get_queryset()), fields=getattr(self.paginator, "required_fields", [])
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.serialize(page))
+
+        return Response(plan.serialize(queryset))
+
+
+class AppMetaInitialPlanMixin:
+    """
+    Loads the file relations & the many-to-many needed by the `get_meta_initial` of the
+    serializer along with the object, for the update meta | see `MetaInitialPlan`.
+    """
+
+    def filter_queryset(self, queryset):
+        """Overridden to apply the `MetaInitialPlan` of the serializer."""
+
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if self.action == "get_meta_for_update" and issubclass(serializer_class, AppWriteOnlyModelSerializer):
+            queryset = get_meta_initial_plan(serializer_class).apply(queryset)
+
+        return queryset
+
+
+class AppStreamingExportMixin:
+    """
+    Exports the whole filtered list in one streamed response, instead of page by page:
+
+        ?format=ndjson    # one JSON row per line
+        ?format=csv       # nested objects flattened to `parent.child` columns
+
+    The filter, search & ordering backends apply as usual. The rows are read using
+    `.iterator(chunk_size=...)` (a server-side cursor on postgres) & serialized a chunk at a
+    time, so the memory stays flat whatever the number of rows.
+
+    Not paginated, so opted in per view using `export_enabled` & limited to the roles in
+    `export_allowed_roles`. For the rest, the export formats are not found (404).
+    """
+
+    export_enabled = False
+    export_allowed_roles = [RoleTypeChoices.admin]
+    export_renderer_classes = [AppNDJSONRenderer, AppCSVRenderer]
+    export_chunk_size = 2000
+
+    def can_export(self):
+        """Returns True if the current user can export the list."""
+
+        if not self.export_enabled or self.action != "list":
+            return False
+
+        return getattr(self.get_authenticated_user(), "role", None) in self.export_allowed_roles
+
+    def get_renderers(self):
+        """Overridden to allow the export formats on the `list` action."""
+
+        renderers = super().get_renderers()
+        if self.can_export():
+            renderers += [_() for _ in self.export_renderer_classes]
+
+        return renderers
+
+    def is_export_request(self):
+        """Returns True if one of the export formats is requested."""
+
+        return isinstance(getattr(self.get_request(), "accepted_renderer", None), AppStreamingRenderer)
+
+    def get_export_rows(self, queryset, plan=None):
+        """Yields the serialized rows of the queryset, a chunk at a time."""
+
+        rows = queryset.iterator(chunk_size=self.export_chunk_size)
+        while chunk := list(itertools.islice(rows, self.export_chunk_size)):
+            yield from plan.serialize(chunk) if plan else self.get_serializer(chunk, many=True).data
+
+    def list(self, request, *args, **kwargs):
+        """Overridden to stream the export formats."""
+
+        if not self.is_export_request():
+            return super().list(request, *args, **kwargs)
+
+        # filtered here, the errors are to be raised before the streaming starts
+        queryset = self.filter_queryset(self.get_queryset())
+        if plan := self.get_values_plan():
+            queryset = plan.get_queryset(queryset)
+
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+
+        response = StreamingHttpResponse(
+            renderer.render_rows(self.get_export_rows(queryset, plan), serializer=self.get_serializer()),
+            content_type=content_type,
+        )
+        filename = self.get_serializer_class().Meta.model._meta.model_name
+        response["Content-Disposition"] = f'attachment; filename="{filename}.{renderer.format}"'
+        return response
+
+    def handle_exception(self, exc):
+        """Overridden to send the errors of the export requests as JSON."""
+
+        if self.is_export_request():
+            self.request.accepted_renderer = AppJSONRenderer()
+            self.request.accepted_media_type = AppJSONRenderer.media_type
+
+        return super().handle_exception(exc)
+
+
+class AppResponseCacheMixin:
+    """
+    Read-through cache of the `list` & `retrieve` responses, opted in using `cache_responses`.
+    Keyed by the view, the normalized query params & the role of the user. Invalidated when
+    any of the models the response is made of changes | see `ResponseCacheRegistry`.
+
+        cache_responses = True
+        cache_response_depends_on = [Bed]   # models used besides the serialized ones (ex: filters)
+        cache_response_vary_on_user = True  # for the responses specific to the user
+
+    Needed by the `etag_actions`, the `ETag` is made of the version of the cached responses.
+    """
+
+    cache_responses = False
+    cache_response_actions = ["list", "retrieve"]
+    cache_response_timeout = 60 * 10
+    cache_response_depends_on = []
+    cache_response_vary_on_user = False
+
+    def __init_subclass__(cls, **kwargs):
+        """Registers the view along with the models it depends on, for the invalidation."""
+
+        super().__init_subclass__(**kwargs)
+        not_cached = set(getattr(cls, "etag_actions", [])) - set(
+            cls.cache_response_actions if cls.cache_responses else []
+        )
+        assert (
+            not not_cached
+        ), f"{cls.__qualname__}: set `cache_responses` for the `etag_actions` {sorted(not_cached)}."
+
+        if cls.cache_responses:
+            models = get_queryset_plan(cls.serializer_class).get_models()
+            response_cache_registry.register(cls, [*models, *cls.cache_response_depends_on])
+
+    def get_response_cache_key(self):
+        """Returns the cache key of the response of the current request."""
+
+        request = self.get_request()
+        user = self.get_authenticated_user()
+        params = urlencode(sorted((k, v) for k in request.query_params for v in request.query_params.getlist(k)))
+        signature = [
+            settings.APP_CODE_REVISION,
+            self.action,
+            request.get_host(),
+            sorted(self.kwargs.items()),
+            params,
+            getattr(user, "role", None),
+            user.pk if user and self.cache_response_vary_on_user else None,
+        ]
+
+        version = cache.get(response_cache_registry.get_version_key(self.__class__), 0)
+        signature = hashlib.md5(repr(signature).encode()).hexdigest()
+        return f"response-cache:{self.__class__.__qualname__}:{version}:{signature}"
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """Returns the cached response if there, else the response of the `handler` is cached."""
+
+        if not self.cache_responses or self.action not in self.cache_response_actions:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key()
+        if (data := cache.get(key)) is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, timeout=self.cache_response_timeout)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """Overridden to read through the response cache."""
+
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Overridden to read through the response cache."""
+
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+
 class AppModelListAPIViewSet(
+    AppStreamingExportMixin,
     AppViewMixin,
+    AppResponseCacheMixin,
+    AppQuerysetPlanMixin,
+    AppValuesListMixin,
     ListModelMixin,
     AppGenericViewSet,
 ):
@@ -68,17 +349,48 @@ class AppModelListAPIViewSet(
     """
 
     pagination_class = AppPagination  # page-size: 25
+    # the client can pick one of these with `?pagination=cursor`
+    pagination_classes = APP_PAGINATION_CLASSES
+    pagination_query_param = "pagination"
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        AppSearchFilter,
         filters.OrderingFilter,
     ]
 
     filterset_fields = []  # override
-    search_fields = []  # override
+    search_fields = []  # override | prefix with `%` for the ranked trigram search
     ordering_fields = "__all__"
     all_table_columns = {}
 
+    @property
+    def paginator(self):
+        """Overridden to pick the pagination class from the `pagination_query_param`, if given."""
+
+        if not hasattr(self, "_paginator"):
+            pagination_class = self.pagination_classes.get(
+                self.request.query_params.get(self.pagination_query_param), self.pagination_class
+            )
+            self._paginator = pagination_class() if pagination_class else None
+
+        return self._paginator
+
+    def get_filter_signature(self):
+        """
+        Returns the query params that decide the filtered queryset as a normalized string.
+        Pagination & ordering params are left out. Used to key the cached aggregates.
+        """
+
+        params = self.request.query_params
+        ignored = {
+            getattr(self.paginator, "page_query_param", None),
+            getattr(self.paginator, "page_size_query_param", None),
+            getattr(self.paginator, "cursor_query_param", None),
+            self.pagination_query_param,
+            api_settings.ORDERING_PARAM,
+        }
+        return urlencode(sorted((k, v) for k in params if k not in ignored for v in params.getlist(k)))
+
     @action(
         methods=["GET"],
         url_path="table-meta",
@@ -90,9 +402,8 @@ class AppModelListAPIViewSet(
         config can vary based on user permission and preference.
         """
 
-        serializer = self.get_serializer_class()
         if not self.all_table_columns:
-            table_meta = {field: custom_capitalize(field) for field in serializer.Meta.fields}
+            table_meta = get_table_columns(self.get_serializer_class(), settings.APP_CODE_REVISION)
         else:
             table_meta = self.all_table_columns
         return self.send_response(data={"columns": table_meta})
@@ -100,6 +411,8 @@ class AppModelListAPIViewSet(
 
 class AppModelRetrieveAPIViewSet(
     AppViewMixin,
+    AppResponseCacheMixin,
+    AppQuerysetPlanMixin,
     RetrieveModelMixin,
     AppGenericViewSet,
 ):
@@ -115,6 +428,7 @@ class AppModelRetrieveAPIViewSet(
 
 class AppModelCUDAPIViewSet(
     AppViewMixin,
+    AppMetaInitialPlanMixin,
     CreateModelMixin,
     UpdateModelMixin,
     DestroyModelMixin,
@@ -239,6 +553,7 @@ class AppModelCreatePIViewSet(
 
 class AppModelUpdateAPIViewSet(
     AppViewMixin,
+    AppMetaInitialPlanMixin,
     UpdateModelMixin,
     AppGenericViewSet,
 ):
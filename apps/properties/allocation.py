@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Subquery
+
+from apps.properties.models.booking import BedReservation
+from apps.properties.models.properties import Bed, Room
+
+
+class BedAllocationStrategy:
+    """
+    Picks the bed to allocate among the beds of a property & room type free over the stay.
+    The rooms with such a bed are put in the order they are filled (`get_rooms`) & a free bed
+    of the first one is picked & locked (`FOR UPDATE SKIP LOCKED`) in a single statement.
+    The concurrent allocations move on to another bed instead of waiting on each other.
+
+    Set `BED_ALLOCATION_STRATEGY` to one of the `BED_ALLOCATION_STRATEGIES`.
+    """
+
+    # order in which the rooms are filled, on the `room_reservations_idx` indexes
+    room_ordering = ["id"]
+
+    def get_rooms(self, rooms):
+        """Returns the given rooms with a free bed, in the order they are filled."""
+
+        return rooms.order_by(*self.room_ordering)
+
+    def get_bed(self, property_id, room_type_id, period):
+        """
+        Returns the bed to allocate, locked. None if all the beds free over the whole `period`
+        (a `DateRange`) are taken or locked.
+        """
+
+        beds = Bed.objects.filter(
+            # on the gist index of the `bed_reservation_no_overlap` constraint
+            ~Exists(BedReservation.objects.filter(bed=OuterRef("pk"), period__overlap=period)),
+            property_room_type__property_id=property_id,
+            room_type_id=room_type_id,
+        )
+        rooms = Room.objects.filter(
+            Exists(beds.filter(room=OuterRef("pk"))),
+            property_room_type__property_id=property_id,
+            property_room_type__room_type_id=room_type_id,
+        )
+        beds = beds.select_for_update(skip_locked=True, of=("self",)).order_by("id")
+
+        bed = beds.filter(room=Subquery(self.get_rooms(rooms).values("id")[:1])).first()
+        if not bed:
+            # the free beds of the first room are being allocated, a bed of the next rooms in order
+            bed = beds.order_by(*self.get_bed_ordering()).first()
+        return bed
+
+    def get_bed_ordering(self):
+        """Returns the `room_ordering` over the beds, the beds of a room in bed order."""
+
+        return [
+            _ if _ == "?" else f"-room__{_[1:]}" if _.startswith("-") else f"room__{_}" for _ in self.room_ordering
+        ] + ["id"]
+
+
+class FillFirstBedAllocation(BedAllocationStrategy):
+    """Fills the fullest room first, a room is filled before the next one is opened."""
+
+    room_ordering = ["-reservations_count", "id"]
+
+
+class SpreadOutBedAllocation(BedAllocationStrategy):
+    """Fills the emptiest room first, the beds are spread out evenly over the rooms."""
+
+    room_ordering = ["reservations_count", "id"]
+
+
+class RandomBedAllocation(BedAllocationStrategy):
+    """Fills a random room with a free bed."""
+
+    room_ordering = ["?"]
+
+
+BED_ALLOCATION_STRATEGIES = {
+    "fill_first": FillFirstBedAllocation,
+    "spread_out": SpreadOutBedAllocation,
+    "random": RandomBedAllocation,
+}
+
+
+def get_bed_allocation_strategy(name=None):
+    """Returns the allocation strategy of the given name, else the `BED_ALLOCATION_STRATEGY`."""
+
+    return BED_ALLOCATION_STRATEGIES[name or settings.BED_ALLOCATION_STRATEGY]()
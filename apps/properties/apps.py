@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PropertiesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.properties"
+
+    def ready(self):
+        """Connects the model signals."""
+
+        from apps.properties import signals  # noqa
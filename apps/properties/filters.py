@@ -0,0 +1,100 @@
+from django import forms
+from django.db.models import Exists, OuterRef
+from django_filters import rest_framework as filters
+
+from apps.properties.choices import GenderChoices, RoomTypesChoices
+from apps.properties.models.booking import BedReservation
+from apps.properties.models.properties import Bed, Property, PropertyRoomType
+from apps.properties.utils import get_stay_period
+
+
+class PropertyFilterForm(forms.Form):
+    """Validates the stay of the `PropertyFilterSet`, a move out needs a move in before it."""
+
+    def clean(self):
+        cleaned_data = super().clean()
+        move_in_date, move_out_date = cleaned_data.get("move_in_date"), cleaned_data.get("move_out_date")
+        if move_out_date and not move_in_date:
+            self.add_error("move_in_date", "This field is required along with the move_out_date.")
+        elif move_out_date and move_out_date <= move_in_date:
+            self.add_error("move_out_date", "The move_out_date must be after the move_in_date.")
+        return cleaned_data
+
+
+class PropertyFilterSet(filters.FilterSet):
+    """
+    Filters of the property listing. The room type level filters are applied together as a
+    single `EXISTS` subquery on `PropertyRoomType`, so a property matches only when one of
+    its room types satisfies all of them (ex: a double room under 10000 with a free bed).
+    No joins, hence no duplicate rows & no `DISTINCT`.
+
+    With a `move_in_date` (& optionally a `move_out_date`) the free beds are the ones with no
+    reservation over the stay, rather than the ones free today. A `move_in_date` alone
+    implies `has_available_beds`.
+
+    The old `related_property_room_types__*` params are kept for the existing clients.
+    """
+
+    # filter name: lookup on `PropertyRoomType`
+    room_type_filters = {
+        "min_price": "price_per_month__gte",
+        "max_price": "price_per_month__lte",
+        "room_type": "room_type__name",
+        "related_property_room_types__room_type__name": "room_type__name",
+        "related_property_room_types__price_per_month": "price_per_month",
+    }
+
+    min_price = filters.NumberFilter(method="filter_room_types")
+    max_price = filters.NumberFilter(method="filter_room_types")
+    room_type = filters.ChoiceFilter(choices=RoomTypesChoices.choices, method="filter_room_types")
+    has_available_beds = filters.BooleanFilter(method="filter_room_types")
+    move_in_date = filters.DateFilter(method="filter_room_types")
+    move_out_date = filters.DateFilter(method="filter_room_types")
+    gender = filters.ChoiceFilter(choices=GenderChoices.choices)
+    related_property_room_types__room_type__name = filters.CharFilter(method="filter_room_types")
+    related_property_room_types__price_per_month = filters.NumberFilter(method="filter_room_types")
+
+    class Meta:
+        model = Property
+        form = PropertyFilterForm
+        fields = ["location"]
+
+    def filter_room_types(self, queryset, name, value):
+        """Room type filters are applied together in `filter_queryset`."""
+
+        return queryset
+
+    def filter_queryset(self, queryset):
+        """Overridden to apply the room type level filters as one `EXISTS` subquery."""
+
+        queryset = super().filter_queryset(queryset)
+
+        lookups = {
+            lookup: self.form.cleaned_data[name]
+            for name, lookup in self.room_type_filters.items()
+            if self.form.cleaned_data.get(name) not in [None, ""]
+        }
+        has_available_beds = self.form.cleaned_data.get("has_available_beds")
+        move_in_date = self.form.cleaned_data.get("move_in_date")
+        if move_in_date and has_available_beds is None:
+            has_available_beds = True
+        if not lookups and has_available_beds is None:
+            return queryset
+
+        room_types = PropertyRoomType.objects.filter(property=OuterRef("pk"), **lookups)
+        available_beds = Bed.objects.filter(property_room_type=OuterRef("pk"))
+        if move_in_date:
+            # on the gist index of the `bed_reservation_no_overlap` constraint
+            period = get_stay_period(move_in_date, self.form.cleaned_data.get("move_out_date"))
+            available_beds = available_beds.filter(
+                ~Exists(BedReservation.objects.filter(bed=OuterRef("pk"), period__overlap=period))
+            )
+        else:
+            available_beds = available_beds.filter(is_available=True)
+        with_available_beds = room_types.filter(Exists(available_beds))
+
+        if has_available_beds is None:
+            return queryset.filter(Exists(room_types))
+        elif has_available_beds:
+            return queryset.filter(Exists(with_available_beds))
+        return queryset.filter(Exists(room_types), ~Exists(with_available_beds))
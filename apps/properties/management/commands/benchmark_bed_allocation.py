@@ -0,0 +1,178 @@
+import datetime
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from apps.access.models.user import User
+from apps.common.management.commands.base import AppBaseCommand
+from apps.properties.choices import GenderChoices, RoomTypesChoices
+from apps.properties.models.booking import Booking
+from apps.properties.models.properties import Bed, Property, RoomType
+from apps.properties.serializers.properties import PropertyRoomTypeSerializer
+from apps.properties.utils import allocate_bed
+
+
+def legacy_allocate_bed(booking, user):
+    """The previous allocation, locks every available bed of the room type. Kept only for comparison."""
+
+    with transaction.atomic():
+        available_beds = Bed.objects.select_for_update().filter(
+            property_room_type__property=booking.property, room_type=booking.room_type, is_available=True
+        )
+        if not available_beds.exists():
+            raise Exception("No available beds in this property and room type.")
+        total_rooms = booking.property.related_property_room_types.filter(room_type=booking.room_type).count()
+        total_empty_rooms = available_beds.values("property_room_type").distinct().count()
+        if total_empty_rooms == total_rooms:
+            bed = available_beds.first()
+        elif available_beds.count() > 1:
+            bed = random.choice(list(available_beds))
+        else:
+            bed = available_beds.first()
+        bed.is_available = False
+        bed.user = user
+        bed.save()
+        booking.bed = bed
+        booking.status = "allotted"
+        booking.save()
+    return bed
+
+
+class Command(AppBaseCommand):
+    help = (
+        "Benchmarks parallel bed allocations for a single synthetic property. Needs a Postgres database, the "
+        "allocations are committed by the workers, so the synthetic data is deleted at the end of each run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=50, help="Number of sixtuple occupancy rooms.")
+        parser.add_argument("--workers", type=int, default=16, help="Number of parallel allocations.")
+        parser.add_argument("--hold", type=float, default=0.005, help="Seconds the transaction is held after.")
+        parser.add_argument(
+            "--move-in-days",
+            type=int,
+            default=None,
+            help="Move in this many days from today, the future stays are only reserved. Skips the legacy allocation.",
+        )
+
+    def handle(self, *args, **options):
+        """Runs the allocations in parallel with both implementations and compares."""
+
+        if connection.vendor != "postgresql":
+            raise CommandError("SKIP LOCKED needs Postgres, run this against a local Postgres database.")
+
+        implementations = [("lock all beds", legacy_allocate_bed), ("skip locked", allocate_bed)]
+        joining_date = datetime.date(2025, 1, 1)
+        if options["move_in_days"] is not None:
+            # the legacy allocation knows nothing of the reservations
+            implementations = implementations[1:]
+            joining_date = timezone.localdate() + datetime.timedelta(days=options["move_in_days"])
+
+        for name, func in implementations:
+            bookings = self.create_synthetic_bookings(options["rooms"], joining_date)
+            try:
+                elapsed, latencies, failures = self.run_allocations(func, bookings, options)
+                allotted = Booking.objects.filter(id__in=[_.id for _ in bookings], bed__isnull=False)
+                self.print_styled_message(
+                    f"{name}: {len(bookings)} allocations, {options['workers']} workers in {elapsed:.2f} s"
+                    f" | {len(latencies) / elapsed:.0f} per second"
+                    f" | p50: {statistics.median(latencies) * 1000:.1f} ms"
+                    f" | p95: {statistics.quantiles(latencies, n=20)[-1] * 1000:.1f} ms"
+                    f" | failures: {failures}"
+                    f" | beds allotted twice: {allotted.count() - allotted.values('bed').distinct().count()}"
+                    f" | bookings without a bed: {len(bookings) - allotted.count()}",
+                    "SUCCESS",
+                )
+            finally:
+                self.delete_synthetic_data()
+
+    @staticmethod
+    def run_allocations(func, bookings, options):
+        """Allocates a bed for every booking from `workers` threads, each with its own connection."""
+
+        def allocate(chunk):
+            latencies, failures = [], 0
+            try:
+                for booking in chunk:
+                    start = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            func(booking, booking.user)
+                            # the rest of the webhook, before the transaction is committed
+                            time.sleep(options["hold"])
+                        latencies.append(time.perf_counter() - start)
+                    except Exception:
+                        failures += 1
+            finally:
+                connections.close_all()
+            return latencies, failures
+
+        chunks = [bookings[i :: options["workers"]] for i in range(options["workers"])]  # noqa: E203
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            results = list(executor.map(allocate, chunks))
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for chunk_latencies, _ in results for latency in chunk_latencies]
+        return elapsed, latencies, sum(failures for _, failures in results)
+
+    @staticmethod
+    def create_synthetic_bookings(rooms, joining_date):
+        """Creates a property with a sixtuple occupancy room type & a booking for every bed. Committed."""
+
+        with transaction.atomic():
+            room_type, _ = RoomType.objects.get_or_create(
+                name=RoomTypesChoices.sixtuple_occupancy, defaults={"capacity": 6}
+            )
+            _property = Property.objects.create(
+                name="Benchmark Allocation Property",
+                city="Benchmark City",
+                area="Benchmark Area",
+                location="Benchmark Location",
+                latitude=Decimal("12.9716"),
+                longitude=Decimal("77.5946"),
+                janitor="Benchmark Janitor",
+                address="Benchmark Address",
+                phone_number="+915560000000",
+                gender=GenderChoices.male,
+                email="benchmark-allocation@example.com",
+            )
+            serializer = PropertyRoomTypeSerializer(
+                data={
+                    "property": _property.id,
+                    "room_type": room_type.id,
+                    "number_of_rooms": rooms,
+                    "price_per_month": "10000.00",
+                }
+            )
+            serializer.is_valid(raise_exception=True)
+            property_room_type = serializer.save()
+
+            users = User.objects.bulk_create(
+                User(
+                    phone_number=f"+91556{i + 1:07d}",
+                    email=f"benchmark-allocation-{i}@example.com",
+                    gender=GenderChoices.male,
+                )
+                for i in range(property_room_type.total_capacity)
+            )
+            bookings = Booking.objects.bulk_create(
+                Booking(user=user, property=_property, room_type=room_type, joining_date=joining_date)
+                for user in users
+            )
+
+        return list(Booking.objects.filter(id__in=[_.id for _ in bookings]).select_related("user", "property"))
+
+    @staticmethod
+    def delete_synthetic_data():
+        """Deletes the synthetic property, its beds & bookings along with the users."""
+
+        with transaction.atomic():
+            Property.objects.filter(email="benchmark-allocation@example.com").delete()
+            User.objects.filter(email__startswith="benchmark-allocation-").delete()
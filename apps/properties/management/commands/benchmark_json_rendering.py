@@ -0,0 +1,95 @@
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.common.management.commands.base import AppBaseCommand
+from apps.common.renderers import AppJSONRenderer
+from apps.common.views.api.base import AppViewMixin
+from apps.properties.choices import GenderChoices, RoomTypesChoices
+from apps.properties.models.properties import Amenity, Property, PropertyAmenity, PropertyRoomType, RoomType
+from apps.properties.serializers.properties import PropertyListSerializer
+
+
+class Command(AppBaseCommand):
+    help = "Benchmarks the JSON renderers on a page of the property listing. Nothing is persisted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=100, help="Number of properties in the page.")
+        parser.add_argument("--runs", type=int, default=200, help="Number of timed renders per renderer.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        """Creates the synthetic page, times the renderers and rolls back."""
+
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            self.create_synthetic_properties(options["page_size"], rng)
+
+            queryset = Property.objects.filter(name__startswith="Benchmark Property ")
+            page = PropertyListSerializer(queryset, many=True).data
+            # the listing response, as sent by the `AppModelListAPIViewSet`
+            data = AppViewMixin.send_response(
+                data={"count": len(page), "next": None, "previous": None, "results": page}
+            ).data
+
+            transaction.set_rollback(True)
+
+        outputs, timings = {}, {}
+        for name, renderer in [("rest framework json", JSONRenderer()), ("orjson", AppJSONRenderer())]:
+            start = time.perf_counter()
+            for _ in range(options["runs"]):
+                outputs[name] = renderer.render(data, "application/json")
+            timings[name] = (time.perf_counter() - start) / options["runs"]
+
+        self.print_styled_message(
+            f"{options['page_size']} properties, {len(outputs['orjson']) / 1024:.1f} KiB | "
+            + " | ".join(f"{name}: {timing * 1000:.3f} ms" for name, timing in timings.items())
+            + f" | speedup: {timings['rest framework json'] / timings['orjson']:.1f}x"
+            + f" | same output: {len({json.dumps(json.loads(_), sort_keys=True) for _ in outputs.values()}) == 1}",
+            "SUCCESS",
+        )
+
+    def create_synthetic_properties(self, count, rng):
+        """Creates `count` properties with a few amenities & room types each."""
+
+        amenities = [Amenity.objects.get_or_create(name=f"Benchmark Amenity {i}")[0] for i in range(8)]
+        room_types = [
+            RoomType.objects.get_or_create(name=name, defaults={"capacity": capacity})[0]
+            for capacity, name in enumerate(RoomTypesChoices.values, start=1)
+        ]
+
+        properties = Property.objects.bulk_create(
+            Property(
+                name=f"Benchmark Property {i}",
+                city="Benchmark City",
+                area="Benchmark Area",
+                location=f"Benchmark Location {i}",
+                latitude=Decimal(f"{rng.uniform(8, 30):.10f}"),
+                longitude=Decimal(f"{rng.uniform(68, 92):.10f}"),
+                janitor="Benchmark Janitor",
+                address="Benchmark Address",
+                phone_number=f"+91555{i:07d}",
+                gender=GenderChoices.male,
+                email=f"benchmark-{i}@example.com",
+            )
+            for i in range(count)
+        )
+        PropertyAmenity.objects.bulk_create(
+            PropertyAmenity(property=_property, amenity=amenity)
+            for _property in properties
+            for amenity in rng.sample(amenities, 4)
+        )
+        PropertyRoomType.objects.bulk_create(
+            PropertyRoomType(
+                property=_property,
+                room_type=room_type,
+                number_of_rooms=rng.randint(1, 20),
+                price_per_month=Decimal(rng.randrange(500000, 3000000)) / 100,
+            )
+            for _property in properties
+            for room_type in rng.sample(room_types, 3)
+        )
@@ -0,0 +1,111 @@
+import random
+import time
+
+from django.db import transaction
+
+from apps.common.helpers import haversine
+from apps.common.management.commands.base import AppBaseCommand
+from apps.properties.choices import GenderChoices
+from apps.properties.models.properties import Property
+from apps.properties.utils import get_nearby_properties, property_index, query_nearby_properties
+
+
+def legacy_nearby_properties(latitude, longitude, radius):
+    """The previous python loop over every property. Kept only for comparison."""
+
+    nearby_places = [
+        {
+            "id": place.id,
+            "name": place.name,
+            "location": place.location,
+            "distance_km": round(haversine(latitude, longitude, float(place.latitude), float(place.longitude)), 2),
+        }
+        for place in Property.objects.all()
+        if haversine(latitude, longitude, float(place.latitude), float(place.longitude)) <= radius
+    ]
+    filtered_places = [place for place in nearby_places if place["distance_km"] > 0.0]
+    return sorted(filtered_places, key=lambda x: x["distance_km"])
+
+
+class Command(AppBaseCommand):
+    help = "Benchmarks the nearby properties lookup against synthetic properties. Nothing is persisted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100_000, help="Number of synthetic properties.")
+        parser.add_argument("--radius", type=float, default=50, help="Search radius in km.")
+        parser.add_argument("--runs", type=int, default=5, help="Number of timed runs per implementation.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        """Creates the synthetic properties, times both implementations and rolls back."""
+
+        rng = random.Random(options["seed"])
+        with transaction.atomic():
+            self.create_synthetic_properties(options["count"], rng)
+
+            build_time, _ = self.time_it(property_index.build, property_index.loader())
+            self.print_styled_message(f"Spatial index built in {build_time * 1000:.1f} ms", "WARNING")
+
+            for _ in range(options["runs"]):
+                # random points in & around the synthetic data set
+                latitude, longitude = rng.uniform(10, 28), rng.uniform(72, 88)
+
+                timings, results = {}, {}
+                for name, func in [
+                    ("python loop", legacy_nearby_properties),
+                    ("database", query_nearby_properties),
+                    ("spatial index", get_nearby_properties),
+                ]:
+                    timings[name], results[name] = self.time_it(func, latitude, longitude, options["radius"])
+
+                expected = self.as_comparable(results["python loop"])
+                self.print_styled_message(
+                    f"({latitude:.4f}, {longitude:.4f}) -> {len(expected)} places | "
+                    + " | ".join(f"{name}: {timing * 1000:.1f} ms" for name, timing in timings.items())
+                    + f" | same result: {all(self.as_comparable(_) == expected for _ in results.values())}",
+                    "SUCCESS",
+                )
+
+            transaction.set_rollback(True)
+
+        # built from the rolled back rows
+        property_index.reset()
+
+    @staticmethod
+    def as_comparable(result):
+        """Places with the same rounded distance can come in any order, compare them as a set."""
+
+        return {(_["id"], _["distance_km"]) for _ in result}
+
+    @staticmethod
+    def time_it(func, *args):
+        """Returns the time taken and the result of the given function."""
+
+        start = time.perf_counter()
+        result = func(*args)
+        return time.perf_counter() - start, result
+
+    def create_synthetic_properties(self, count, rng):
+        """Bulk creates `count` properties spread across india."""
+
+        self.print_styled_message(f"Creating {count} synthetic properties...", "WARNING")
+        Property.objects.bulk_create(
+            (
+                Property(
+                    name=f"Benchmark Property {i}",
+                    city="Benchmark City",
+                    area="Benchmark Area",
+                    location=f"Benchmark Location {i}",
+                    # the index keeps the coordinates unique
+                    latitude=round(rng.uniform(8, 30), 10) + i * 1e-14,
+                    longitude=round(rng.uniform(68, 92), 10) + i * 1e-14,
+                    janitor="Benchmark Janitor",
+                    address="Benchmark Address",
+                    phone_number=f"+919{i:09d}",
+                    gender=GenderChoices.male,
+                    email=f"benchmark-{i}@example.com",
+                )
+                for i in range(count)
+            ),
+            batch_size=5000,
+        )
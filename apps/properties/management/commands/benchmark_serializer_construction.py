@@ -0,0 +1,73 @@
+import inspect
+import time
+
+from apps.common.management.commands.base import AppBaseCommand
+from apps.common.serializers import AppModelSerializer, CustomErrorMessagesMixin
+from apps.properties.serializers import properties as property_serializers
+
+
+class LegacyConstructionMixin:
+    """The previous construction, the fields are built & customized on every init. Kept only for comparison."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_custom_error_messages(self.fields)
+
+    def get_fields(self):
+        return super(CustomErrorMessagesMixin, self).get_fields()
+
+
+class Command(AppBaseCommand):
+    help = "Benchmarks the construction of the property serializers, per instance vs per class fields."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=500, help="Number of timed constructions per serializer.")
+
+    def handle(self, *args, **options):
+        """Times the construction (along with the fields) of every serializer, both ways."""
+
+        total = {"legacy": 0, "current": 0}
+        for serializer_class in self.get_serializers():
+            legacy_class = type(f"Legacy{serializer_class.__name__}", (LegacyConstructionMixin, serializer_class), {})
+
+            timings = {}
+            for name, _class in [("legacy", legacy_class), ("current", serializer_class)]:
+                _class().fields  # warm up, the current one builds the class level fields here
+                start = time.perf_counter()
+                for _ in range(options["runs"]):
+                    _class().fields
+                timings[name] = (time.perf_counter() - start) / options["runs"]
+                total[name] += timings[name]
+
+            self.print_styled_message(
+                f"{serializer_class.__name__}: "
+                + " | ".join(f"{name}: {timing * 1000000:.0f} us" for name, timing in timings.items())
+                + f" | speedup: {timings['legacy'] / timings['current']:.1f}x"
+                + f" | same fields: {self.describe(legacy_class()) == self.describe(serializer_class())}",
+                "SUCCESS",
+            )
+
+        self.print_styled_message(
+            f"All serializers: legacy: {total['legacy'] * 1000:.2f} ms | current: {total['current'] * 1000:.2f} ms"
+            f" | speedup: {total['legacy'] / total['current']:.1f}x",
+            "WARNING",
+        )
+
+    @staticmethod
+    def get_serializers():
+        """Returns the model serializers of the properties app."""
+
+        return [
+            serializer
+            for _, serializer in inspect.getmembers(property_serializers, inspect.isclass)
+            if issubclass(serializer, AppModelSerializer) and serializer.__module__ == property_serializers.__name__
+        ]
+
+    @staticmethod
+    def describe(serializer):
+        """Returns what matters of the fields, to compare the both ways."""
+
+        return [
+            (name, field.__class__.__name__, field.required, field.read_only, sorted(field.error_messages.items()))
+            for name, field in serializer.fields.items()
+        ]
@@ -0,0 +1,18 @@
+import time
+
+from apps.common.management.commands.base import AppBaseCommand
+from apps.properties.utils import property_index, write_property_snapshot
+
+
+class Command(AppBaseCommand):
+    help = "Generates the memory mapped coordinate snapshots shared by the processes of this host."
+
+    def handle(self, *args, **options):
+        """Writes the snapshot, running processes pick it up on their next lookup."""
+
+        start = time.perf_counter()
+        count = write_property_snapshot()
+        self.print_styled_message(
+            f"Wrote {count} properties to {property_index.snapshot_path} in {time.perf_counter() - start:.2f}s",
+            "SUCCESS",
+        )
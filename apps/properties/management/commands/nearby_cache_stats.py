@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.common.management.commands.base import AppBaseCommand
+from apps.properties.utils import NEARBY_CACHE_STAT_KEYS
+
+
+class Command(AppBaseCommand):
+    help = "Reports the hit/miss counters of the nearby properties cache, used to tune the tile size."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Resets the counters after reporting.")
+
+    def handle(self, *args, **options):
+        """Prints the counters & the hit ratio of the cacheable lookups."""
+
+        stats = {name: cache.get(key, 0) for name, key in NEARBY_CACHE_STAT_KEYS.items()}
+        lookups = stats["hits"] + stats["misses"]
+        config = settings.NEARBY_PROPERTIES_CACHE
+
+        self.print_styled_message(f"Tile size: {config['TILE_SIZE']} degrees | buckets: {config['RADIUS_BUCKETS']} km")
+        for name, value in stats.items():
+            self.print_styled_message(f"{name}: {value}", "SUCCESS")
+        self.print_styled_message(f"hit ratio: {stats['hits'] / lookups if lookups else 0:.2%}", "SUCCESS")
+
+        if options["reset"]:
+            cache.delete_many(NEARBY_CACHE_STAT_KEYS.values())
+            self.print_styled_message("Counters are reset.")
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.3 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0001_squashed_0018_bed_bed_number_bed_is_available_bed_room_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['latitude', 'longitude'], name='property_lat_long_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.3 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0020_trigram_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="propertyroomtype",
+            index=models.Index(fields=["room_type", "price_per_month"], name="property_room_type_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="bed",
+            index=models.Index(fields=["property_room_type", "is_available"], name="bed_room_availability_idx"),
+        ),
+    ]
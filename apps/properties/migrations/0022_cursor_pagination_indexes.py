@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0021_room_type_price_and_bed_availability_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(fields=["created_at", "id"], name="property_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="propertyroomtype",
+            index=models.Index(fields=["created_at", "id"], name="property_room_type_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="propertyschedulevisit",
+            index=models.Index(fields=["created_at", "id"], name="schedule_visit_created_id_idx"),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.3 on 2026-10-17 15:10
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Left, StrIndex
+
+COUNTER_FIELDS = ["available_beds_count", "occupied_beds_count", "vacant_rooms_count"]
+
+
+def count_beds(apps, schema_editor):
+    """Sets the counters of the existing room types & properties from their beds."""
+
+    Bed = apps.get_model("properties", "Bed")
+    Property = apps.get_model("properties", "Property")
+    PropertyRoomType = apps.get_model("properties", "PropertyRoomType")
+
+    room_number = Left("bed_number", StrIndex("bed_number", Value("-")) - 1)
+    counters = {
+        _.pop("property_room_type"): _
+        for _ in Bed.objects.filter(property_room_type__isnull=False)
+        .order_by()
+        .values("property_room_type")
+        .annotate(
+            available_beds_count=Count("id", filter=Q(is_available=True)),
+            occupied_beds_count=Count("id", filter=Q(is_available=False)),
+            vacant_rooms_count=Count(room_number, filter=Q(is_available=True), distinct=True),
+        )
+    }
+
+    property_room_types, properties = [], {}
+    for property_room_type in PropertyRoomType.objects.filter(id__in=counters):
+        _property = properties.setdefault(property_room_type.property_id, Property(id=property_room_type.property_id))
+        for name, value in counters[property_room_type.id].items():
+            setattr(property_room_type, name, value)
+            setattr(_property, name, getattr(_property, name) + value)
+        property_room_types.append(property_room_type)
+
+    PropertyRoomType.objects.bulk_update(property_room_types, COUNTER_FIELDS, batch_size=1000)
+    Property.objects.bulk_update(properties.values(), COUNTER_FIELDS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0022_cursor_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="available_beds_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="occupied_beds_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="vacant_rooms_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="propertyroomtype",
+            name="available_beds_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="propertyroomtype",
+            name="occupied_beds_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="propertyroomtype",
+            name="vacant_rooms_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_beds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.3 on 2026-10-17 17:30
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_rooms(apps, schema_editor):
+    """Creates the rooms of the existing beds (`R 01` of `R 01-A`) & links the beds to them."""
+
+    Bed = apps.get_model("properties", "Bed")
+    Room = apps.get_model("properties", "Room")
+
+    rooms, bed_rooms = {}, []
+    beds = (
+        Bed.objects.filter(property_room_type__isnull=False, bed_number__isnull=False)
+        .order_by("property_room_type", "id")
+        .values_list("id", "property_room_type", "bed_number", "is_available")
+    )
+    for bed_id, property_room_type_id, bed_number, is_available in beds.iterator(chunk_size=2000):
+        key = (property_room_type_id, bed_number.partition("-")[0])
+        room = rooms.get(key)
+        if room is None:
+            room = rooms[key] = Room(property_room_type_id=key[0], room_number=key[1], capacity=0)
+        room.capacity += 1
+        room.occupied_beds_count += 0 if is_available else 1
+        # the beds taken today are reserved in 0025_bed_reservations
+        room.reservations_count += 0 if is_available else 1
+        bed_rooms.append((bed_id, key))
+
+    Room.objects.bulk_create(rooms.values(), batch_size=1000)
+    Bed.objects.bulk_update(
+        [Bed(id=bed_id, room_id=rooms[key].id) for bed_id, key in bed_rooms], ["room"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0023_bed_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Room",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("uuid", models.UUIDField(default=uuid.uuid4, editable=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("room_number", models.CharField(max_length=512)),
+                ("capacity", models.PositiveIntegerField()),
+                ("occupied_beds_count", models.PositiveIntegerField(default=0)),
+                ("reservations_count", models.PositiveIntegerField(default=0)),
+                (
+                    "property_room_type",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="properties.propertyroomtype"),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "abstract": False,
+                "default_related_name": "related_rooms",
+            },
+        ),
+        migrations.AddField(
+            model_name="bed",
+            name="room",
+            field=models.ForeignKey(
+                default=None, null=True, on_delete=django.db.models.deletion.CASCADE, to="properties.room"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["property_room_type", "reservations_count", "id"], name="room_reservations_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["property_room_type", "-reservations_count", "id"], name="room_reservations_desc_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="room",
+            constraint=models.UniqueConstraint(
+                fields=("property_room_type", "room_number"), name="unique_room_in_room_type"
+            ),
+        ),
+        migrations.RunPython(create_rooms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.3 on 2026-10-17 19:10
+
+import uuid
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.db.models.deletion
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.utils import timezone
+
+
+def create_reservations(apps, schema_editor):
+    """
+    Reserves the beds taken today, from the joining of their latest booking (open ended, the
+    move out is not known). The beds taken without a booking are reserved for all the days.
+    """
+
+    Bed = apps.get_model("properties", "Bed")
+    Booking = apps.get_model("properties", "Booking")
+    BedReservation = apps.get_model("properties", "BedReservation")
+
+    today = timezone.localdate()
+    bookings = {}
+    for booking in Booking.objects.filter(bed__is_available=False).order_by("created_at").iterator(chunk_size=2000):
+        bookings[booking.bed_id] = booking
+
+    reservations = []
+    for bed_id in Bed.objects.filter(is_available=False).values_list("id", flat=True).iterator(chunk_size=2000):
+        booking = bookings.get(bed_id)
+        period = DateRange(min(booking.joining_date, today), None, "[)") if booking else DateRange(None, None)
+        reservations.append(BedReservation(bed_id=bed_id, booking=booking, period=period))
+    BedReservation.objects.bulk_create(reservations, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("properties", "0024_rooms"),
+    ]
+
+    operations = [
+        # the `=` on the bed id of the exclusion constraint
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name="booking",
+            name="move_out_date",
+            field=models.DateField(blank=True, default=None, null=True),
+        ),
+        migrations.CreateModel(
+            name="BedReservation",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("uuid", models.UUIDField(default=uuid.uuid4, editable=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("period", django.contrib.postgres.fields.ranges.DateRangeField()),
+                (
+                    "bed",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="properties.bed"),
+                ),
+                (
+                    "booking",
+                    models.ForeignKey(
+                        blank=True,
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="properties.booking",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "abstract": False,
+                "default_related_name": "related_reservations",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="bedreservation",
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(
+                expressions=[("bed", "="), ("period", "&&")],
+                name="bed_reservation_no_overlap",
+            ),
+        ),
+        migrations.RunPython(create_reservations, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
 from django.db import models
 
 from apps.access.models.user import User
@@ -14,7 +16,7 @@ class Booking(BaseModel):
     pk                  - id
     uuid                - uuid
     Fk                  - user, property, room_type, bed
-    DateField           - joining_date
+    DateField           - joining_date (move in), move_out_date
     CharField           - status (choices: pending, confirmed, cancelled)
     DateTimeField       - created_at, modified_at
     """
@@ -23,6 +25,8 @@ class Booking(BaseModel):
     property = models.ForeignKey(to=Property, on_delete=models.CASCADE)
     room_type = models.ForeignKey(to=RoomType, on_delete=models.CASCADE)
     joining_date = models.DateField()
+    # not known for the open ended stays
+    move_out_date = models.DateField(**COMMON_BLANK_AND_NULLABLE_FIELD_CONFIG)
     status = models.CharField(
         max_length=COMMON_CHAR_FIELD_MAX_LENGTH,
         choices=BookingStatusChoices.choices,
@@ -35,6 +39,35 @@ class Booking(BaseModel):
         default_related_name = "related_bookings"
 
 
+class BedReservation(BaseModel):
+    """
+    BedReservation model, the days on which a bed is taken. A bed is free on the days not
+    covered by any of its reservations, `Bed.is_available` is only about today.
+
+    ********************************  Model Fields ********************************
+    pk                  - id
+    uuid                - uuid
+    Fk                  - bed, booking
+    DateRangeField      - period ([move in, move out), open ended if the move out is not known)
+    DateTimeField       - created_at, modified_at
+    """
+
+    bed = models.ForeignKey(to=Bed, on_delete=models.CASCADE)
+    booking = models.ForeignKey(to=Booking, **COMMON_BLANK_AND_NULLABLE_FIELD_CONFIG, on_delete=models.CASCADE)
+    period = DateRangeField()
+
+    class Meta(BaseModel.Meta):
+        default_related_name = "related_reservations"
+        constraints = [
+            # no bed is reserved twice on a day, its gist index answers the availability lookups too
+            ExclusionConstraint(
+                name="bed_reservation_no_overlap",
+                expressions=[("bed", RangeOperators.EQUAL), ("period", RangeOperators.OVERLAPS)],
+                index_type="gist",
+            )
+        ]
+
+
 class Payment(BaseModel):
     """
     Payment model for the application...
@@ -1,3 +1,4 @@
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
 from apps.access.models.user import User
@@ -10,8 +11,33 @@ from apps.common.models.base import (
 )
 from apps.properties.choices import GenderChoices, RoomTypesChoices
 
+# denormalized on `PropertyRoomType` & rolled up on `Property` | see apps.properties.utils.update_bed_counters
+BED_COUNTER_FIELDS = ["available_beds_count", "occupied_beds_count", "vacant_rooms_count"]
 
-class Property(IdentityBaseModel):
+
+class BedCountersModel(models.Model):
+    """
+    Free beds, occupied beds & rooms with a free bed. Maintained in the database with F
+    expressions, on allocation & bed provisioning. These are not written back by `save()`,
+    a stale instance would overwrite the concurrent changes.
+    """
+
+    available_beds_count = models.PositiveIntegerField(default=0)
+    occupied_beds_count = models.PositiveIntegerField(default=0)
+    vacant_rooms_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                _.name for _ in self._meta.concrete_fields if not _.primary_key and _.name not in BED_COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Property(IdentityBaseModel, BedCountersModel):
     """
     Property model for the application...
 
@@ -24,6 +50,7 @@ class Property(IdentityBaseModel):
     EmailField          -
     PhoneNumberField    - property_phonenumber
     DecimalField        - property_latitude, property_longitude,
+    PositiveIntegerField - available_beds_count, occupied_beds_count, vacant_rooms_count
     """
 
     city = models.CharField(max_length=COMMON_CHAR_FIELD_MAX_LENGTH)
@@ -39,6 +66,16 @@ class Property(IdentityBaseModel):
 
     class Meta(BaseModel.Meta):
         default_related_name = "related_properties"
+        indexes = [
+            models.Index(fields=["latitude", "longitude"], name="property_lat_long_idx"),
+            # keyset of the cursor pagination | see apps.common.pagination.AppCursorPagination
+            models.Index(fields=["created_at", "id"], name="property_created_id_idx"),
+            # trigram indexes for the `%` search fields | see apps.common.filters.AppSearchFilter
+            *[
+                GinIndex(fields=[_], name=f"property_{_}_trgm_idx", opclasses=["gin_trgm_ops"])
+                for _ in ["name", "location", "city", "area"]
+            ],
+        ]
 
 
 class Amenity(IdentityBaseModel):
@@ -95,7 +132,7 @@ class RoomType(IdentityBaseModel):
         default_related_name = "related_room_types"
 
 
-class PropertyRoomType(BaseModel):
+class PropertyRoomType(BaseModel, BedCountersModel):
     """
     RoomTypes model for the application...
 
@@ -105,7 +142,7 @@ class PropertyRoomType(BaseModel):
     charField            - room_type_name
     DateTimeField        - created_at, modified_at
     Fk                   - room_type, property
-    PositiveIntegerField - capacity, number_of_rooms
+    PositiveIntegerField - capacity, number_of_rooms, available_beds_count, occupied_beds_count, vacant_rooms_count
     DecimalField         - price_per_month
     BooleanField         - is_available
     """
@@ -120,6 +157,45 @@ class PropertyRoomType(BaseModel):
     class Meta(BaseModel.Meta):
         default_related_name = "related_property_room_types"
         constraints = [models.UniqueConstraint(fields=["property", "room_type"], name="unique_property_room_type")]
+        indexes = [
+            models.Index(fields=["room_type", "price_per_month"], name="property_room_type_price_idx"),
+            models.Index(fields=["created_at", "id"], name="property_room_type_created_idx"),
+        ]
+
+
+class Room(BaseModel):
+    """
+    Room model, the beds of a property room type grouped by their physical room.
+
+    ********************************  Model Fields ********************************
+    pk                   - id
+    uuid                 - uuid
+    Fk                   - property_room_type
+    CharField            - room_number
+    PositiveIntegerField - capacity, occupied_beds_count, reservations_count
+    DateTimeField        - created_at, modified_at
+    """
+
+    property_room_type = models.ForeignKey(PropertyRoomType, on_delete=models.CASCADE)
+    room_number = models.CharField(max_length=COMMON_CHAR_FIELD_MAX_LENGTH)
+    capacity = models.PositiveIntegerField()
+    # maintained on allocation & bed provisioning | see apps.properties.utils.allocate_bed
+    occupied_beds_count = models.PositiveIntegerField(default=0)
+    # reservations of its beds not ended yet, added on allocation & taken off by `sync_bed_occupancy`
+    reservations_count = models.PositiveIntegerField(default=0)
+
+    class Meta(BaseModel.Meta):
+        default_related_name = "related_rooms"
+        constraints = [
+            models.UniqueConstraint(fields=["property_room_type", "room_number"], name="unique_room_in_room_type")
+        ]
+        # rooms by reservations, for the allocation strategies | see apps.properties.allocation
+        indexes = [
+            models.Index(fields=["property_room_type", "reservations_count", "id"], name="room_reservations_idx"),
+            models.Index(
+                fields=["property_room_type", "-reservations_count", "id"], name="room_reservations_desc_idx"
+            ),
+        ]
 
 
 class Bed(BaseModel):
@@ -129,7 +205,7 @@ class Bed(BaseModel):
     ********************************  Model Fields ********************************
     pk                   - id
     uuid                 - uuid
-    Fk                   - property_room_type
+    Fk                   - property_room_type, room
     CharField            - bed_type
     BooleanField         - is_available
     PositiveIntegerField - bed_number
@@ -139,6 +215,7 @@ class Bed(BaseModel):
     property_room_type = models.ForeignKey(
         PropertyRoomType, on_delete=models.CASCADE, related_name="beds", **COMMON_NULLABLE_FIELD_CONFIG
     )
+    room = models.ForeignKey(to=Room, on_delete=models.CASCADE, **COMMON_NULLABLE_FIELD_CONFIG)
     room_type = models.ForeignKey(to=RoomType, on_delete=models.CASCADE, **COMMON_NULLABLE_FIELD_CONFIG)
     user = models.ForeignKey(User, on_delete=models.CASCADE, **COMMON_NULLABLE_FIELD_CONFIG)
     is_available = models.BooleanField(default=True)
@@ -147,6 +224,7 @@ class Bed(BaseModel):
     class Meta(BaseModel.Meta):
         default_related_name = "related_beds"
         constraints = [models.UniqueConstraint(fields=["property_room_type", "bed_number"], name="unique_bed_in_room")]
+        indexes = [models.Index(fields=["property_room_type", "is_available"], name="bed_room_availability_idx")]
 
 
 class TimeSlot(BaseModel):
@@ -187,3 +265,4 @@ class PropertyScheduleVisit(BaseModel):
 
     class Meta(BaseModel.Meta):
         default_related_name = "related_schedule_visits"
+        indexes = [models.Index(fields=["created_at", "id"], name="schedule_visit_created_id_idx")]
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from apps.properties.models.booking import Booking
+from apps.properties.utils import get_stay_period, has_available_beds
 
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -10,4 +11,20 @@ class BookingSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Booking
-        fields = ["property", "room_type", "joining_date", "amount"]
+        fields = ["property", "room_type", "joining_date", "move_out_date", "amount"]
+
+    def validate(self, attrs):
+        """
+        Bookings are taken only while there is a bed free from the move in to the move out,
+        checked without the database if possible.
+        """
+
+        attrs = super().validate(attrs)
+        move_out_date = attrs.get("move_out_date")
+        if move_out_date and move_out_date <= attrs["joining_date"]:
+            raise serializers.ValidationError({"move_out_date": "Move out date must be after the joining date."})
+
+        period = get_stay_period(attrs["joining_date"], move_out_date)
+        if not has_available_beds(attrs["property"].id, attrs["room_type"].id, period):
+            raise serializers.ValidationError("No beds are available in this property for the room type.")
+        return attrs
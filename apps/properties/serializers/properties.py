@@ -1,11 +1,17 @@
+import functools
 import string
 from datetime import datetime
 
 from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from rest_framework import serializers
 
+from apps.common.response_cache import response_cache_registry
 from apps.common.serializers import AppReadOnlyModelSerializer, AppWriteOnlyModelSerializer
 from apps.properties.choices import RoomTypesChoices
+from apps.properties.models.booking import BedReservation
 from apps.properties.models.properties import (
     Amenity,
     Bed,
@@ -13,9 +19,11 @@ from apps.properties.models.properties import (
     PropertyAmenity,
     PropertyRoomType,
     PropertyScheduleVisit,
+    Room,
     RoomType,
     TimeSlot,
 )
+from apps.properties.utils import bed_inventory, get_stay_period, refresh_bed_counters
 
 
 class PropertySerializer(AppWriteOnlyModelSerializer):
@@ -140,11 +148,14 @@ class PropertyRoomTypeSerializer(AppWriteOnlyModelSerializer):
         fields = ["property", "room_type", "number_of_rooms", "price_per_month", "total_capacity"]
         read_only_fields = ["is_Available", "total_capacity"]
 
+    bed_batch_size = 1000
+
     def create(self, validated_data):
         """Override to calculate the capacity and auto-create bed details."""
 
-        instance = super().create(validated_data=validated_data)
-        self._update_beds(instance)
+        with transaction.atomic():
+            instance = super().create(validated_data=validated_data)
+            self._update_beds(instance)
         return instance
 
     def update(self, instance, validated_data):
@@ -158,41 +169,106 @@ class PropertyRoomTypeSerializer(AppWriteOnlyModelSerializer):
     def _update_beds(self, instance):
         """
         Helper method to calculate capacity and update bed details.
-        Adds or removes beds based on the current number of rooms.
+        The rooms & bed numbers are generated in memory, the missing ones are created in batches
+        & the surplus ones (rooms removed or room type changed) are deleted at once.
         """
 
         room_type = instance.room_type
-        room_type_id = instance.room_type.id
-        room_type = RoomType.objects.get(id=room_type_id)
         instance.total_capacity = instance.number_of_rooms * room_type.capacity
-        existing_beds = Bed.objects.filter(property_room_type=instance)
-        current_bed_count = existing_beds.count()
-        required_bed_count = room_type.capacity * instance.number_of_rooms
-        if required_bed_count < current_bed_count:
-            beds_to_remove = current_bed_count - required_bed_count
-            beds_to_delete = existing_beds.order_by("-id")[:beds_to_remove]
-            for bed in beds_to_delete:
-                bed.delete()
-        elif required_bed_count > current_bed_count:
-            suffix_map = {
-                RoomTypesChoices.single_occupancy: string.ascii_uppercase,
-                RoomTypesChoices.double_occupancy: [f"A{chr(i)}" for i in range(65, 65 + room_type.capacity)],
-                RoomTypesChoices.triple_occupancy: [f"B{chr(i)}" for i in range(65, 65 + room_type.capacity)],
-                RoomTypesChoices.quadruple_occupancy: [f"C{chr(i)}" for i in range(65, 65 + room_type.capacity)],
-                RoomTypesChoices.quintuple_occupancy: [f"D{chr(i)}" for i in range(65, 65 + room_type.capacity)],
-                RoomTypesChoices.sixtuple_occupancy: [f"E{chr(i)}" for i in range(65, 65 + room_type.capacity)],
-            }
-            suffix_list = suffix_map.get(room_type.name.lower(), string.ascii_uppercase)
-            current_room_count = current_bed_count // room_type.capacity
-            for room_no in range(current_room_count + 1, instance.number_of_rooms + 1):
-                for bed_no in range(1, room_type.capacity + 1):
-                    bed_suffix = suffix_list[bed_no - 1]
-                    bed_number = f"R{room_no: 03d}-{bed_suffix}"
-                    room_type = RoomType.objects.get(id=room_type_id)
-                    Bed.objects.create(property_room_type=instance, room_type=room_type, bed_number=bed_number)
+
+        bed_numbers = self.get_bed_numbers(room_type, instance.number_of_rooms)
+        room_numbers = dict.fromkeys(bed_numbers.values())
+
+        beds = Bed.objects.filter(property_room_type=instance)
+        existing_beds = dict(beds.values_list("bed_number", "id"))
+        # the room type changed, the bitmaps of the previous one are dropped as well
+        previous_room_type_ids = set(beds.exclude(room_type=room_type).values_list("room_type_id", flat=True))
+        surplus_bed_ids = [bed_id for bed_number, bed_id in existing_beds.items() if bed_number not in bed_numbers]
+        self.validate_surplus_beds(surplus_bed_ids)
+
+        rooms = dict(Room.objects.filter(property_room_type=instance).values_list("room_number", "id"))
+        surplus_room_ids = [room_id for room_number, room_id in rooms.items() if room_number not in room_numbers]
+        if surplus_room_ids:
+            # along with their beds
+            Room.objects.filter(id__in=surplus_room_ids).delete()
+
+        missing_rooms = [
+            Room(property_room_type=instance, room_number=room_number, capacity=room_type.capacity)
+            for room_number in room_numbers
+            if room_number not in rooms
+        ]
+        rooms.update(
+            {_.room_number: _.id for _ in Room.objects.bulk_create(missing_rooms, batch_size=self.bed_batch_size)}
+        )
+
+        if surplus_bed_ids:
+            # queryset delete, the beds of the surplus rooms are already deleted along with them
+            Bed.objects.filter(id__in=surplus_bed_ids).delete()
+
+        missing_beds = [
+            Bed(property_room_type=instance, room_type=room_type, room_id=rooms[room_number], bed_number=bed_number)
+            for bed_number, room_number in bed_numbers.items()
+            if bed_number not in existing_beds
+        ]
+        if missing_beds:
+            Bed.objects.bulk_create(missing_beds, batch_size=self.bed_batch_size)
+            # `bulk_create` does not send `post_save`
+            response_cache_registry.handle_change(sender=Bed)
+
+        if previous_room_type_ids:
+            # the beds kept (same bed numbers) move to the new room type
+            beds.exclude(room_type=room_type).update(room_type=room_type)
+            response_cache_registry.handle_change(sender=Bed)
+
+        if surplus_room_ids or surplus_bed_ids or missing_beds or previous_room_type_ids:
+            occupied_beds_count = (
+                Bed.objects.filter(room=OuterRef("pk"), is_available=False)
+                .order_by()
+                .values("room")
+                .annotate(count=Count("id"))
+                .values("count")
+            )
+            Room.objects.filter(property_room_type=instance).update(
+                capacity=room_type.capacity, occupied_beds_count=Coalesce(Subquery(occupied_beds_count), 0)
+            )
+            for room_type_id in {room_type.id, *previous_room_type_ids}:
+                transaction.on_commit(functools.partial(bed_inventory.invalidate, instance.property_id, room_type_id))
+
         instance.save()
+        refresh_bed_counters(instance)
         return instance
 
+    @staticmethod
+    def validate_surplus_beds(bed_ids):
+        """The beds taken now or reserved from today on are not deleted, the room type is not changed then."""
+
+        reservations = BedReservation.objects.filter(
+            bed=OuterRef("pk"), period__overlap=get_stay_period(timezone.localdate())
+        )
+        if Bed.objects.filter(Q(is_available=False) | Exists(reservations), id__in=bed_ids).exists():
+            raise serializers.ValidationError(
+                {"number_of_rooms": "The rooms to be removed have beds that are occupied or reserved."}
+            )
+
+    @staticmethod
+    def get_bed_numbers(room_type, number_of_rooms):
+        """Returns the bed numbers (`R 01-A`, ...) of all the rooms, in order, along with their room (`R 01`)."""
+
+        suffix_map = {
+            RoomTypesChoices.single_occupancy: string.ascii_uppercase,
+            RoomTypesChoices.double_occupancy: [f"A{chr(i)}" for i in range(65, 65 + room_type.capacity)],
+            RoomTypesChoices.triple_occupancy: [f"B{chr(i)}" for i in range(65, 65 + room_type.capacity)],
+            RoomTypesChoices.quadruple_occupancy: [f"C{chr(i)}" for i in range(65, 65 + room_type.capacity)],
+            RoomTypesChoices.quintuple_occupancy: [f"D{chr(i)}" for i in range(65, 65 + room_type.capacity)],
+            RoomTypesChoices.sixtuple_occupancy: [f"E{chr(i)}" for i in range(65, 65 + room_type.capacity)],
+        }
+        suffix_list = suffix_map.get(room_type.name.lower(), string.ascii_uppercase)
+        return {
+            f"R{room_no: 03d}-{suffix_list[bed_no - 1]}": f"R{room_no: 03d}"
+            for room_no in range(1, number_of_rooms + 1)
+            for bed_no in range(1, room_type.capacity + 1)
+        }
+
 
 class PropertyLATandLONSerializer(serializers.Serializer):
     """Serializer for properties latitude and longitude"""
@@ -228,6 +304,14 @@ class PropertyLATandLONSerializer(serializers.Serializer):
         return data
 
 
+class NearbyPropertiesQuerySerializer(serializers.Serializer):
+    """Serializer for the query params of the nearby properties"""
+
+    radius = serializers.FloatField(default=50, min_value=0)
+    limit = serializers.IntegerField(default=None, min_value=1)
+    offset = serializers.IntegerField(default=0, min_value=0)
+
+
 class PropertyHelperSerializer(AppReadOnlyModelSerializer):
     """Serializer for property model."""
 
@@ -268,6 +352,7 @@ class PropertyRoomListSerializer(AppReadOnlyModelSerializer):
             "price_per_month",
             "total_capacity",
             "is_bed_available",
+            "available_beds_count",
         ]
 
 
@@ -287,6 +372,7 @@ class PropertyRoomRetriveSerializer(AppReadOnlyModelSerializer):
             "price_per_month",
             "total_capacity",
             "is_bed_available",
+            "available_beds_count",
         ]
 
 
@@ -375,7 +461,15 @@ class PropertyRoomRetriveForPropertyListSerializer(AppReadOnlyModelSerializer):
 
     class Meta(AppReadOnlyModelSerializer.Meta):
         model = PropertyRoomType
-        fields = ["id", "room_type", "number_of_rooms", "price_per_month", "total_capacity", "is_bed_available"]
+        fields = [
+            "id",
+            "room_type",
+            "number_of_rooms",
+            "price_per_month",
+            "total_capacity",
+            "is_bed_available",
+            "available_beds_count",
+        ]
 
 
 class PropertyListSerializer(AppReadOnlyModelSerializer):
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.properties.models.booking import BedReservation
+from apps.properties.models.properties import Bed, Property, PropertyRoomType, RoomType
+from apps.properties.utils import (
+    bed_inventory,
+    get_property_index_row,
+    invalidate_cached_property_facets,
+    invalidate_nearby_cache,
+    property_index,
+    roll_up_property_bed_counters,
+    schedule_property_snapshot,
+)
+
+
+@receiver(pre_save, sender=Property)
+def track_property_location(sender, instance, **kwargs):
+    """Keeps the location before the change, the nearby lookups around it are invalidated too."""
+
+    instance._previous_location = (
+        Property.objects.filter(pk=instance.pk).values_list("latitude", "longitude").first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Property)
+def update_property_index(sender, instance, **kwargs):
+    """Adds or updates the property in the `property_index` once the change is committed."""
+
+    row = get_property_index_row(instance)
+    locations = [row[1:3], *filter(None, [getattr(instance, "_previous_location", None)])]
+    transaction.on_commit(lambda: property_index.upsert(*row))
+    transaction.on_commit(lambda: invalidate_nearby_cache(*locations))
+    transaction.on_commit(schedule_property_snapshot)
+
+
+@receiver(post_delete, sender=Property)
+def remove_from_property_index(sender, instance, **kwargs):
+    """Removes the property from the `property_index` once the delete is committed."""
+
+    _id, location = instance.id, (instance.latitude, instance.longitude)
+    transaction.on_commit(lambda: property_index.remove(_id))
+    transaction.on_commit(lambda: invalidate_nearby_cache(location))
+    transaction.on_commit(schedule_property_snapshot)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+@receiver(post_save, sender=PropertyRoomType)
+@receiver(post_delete, sender=PropertyRoomType)
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+@receiver(post_save, sender=Bed)
+@receiver(post_delete, sender=Bed)
+@receiver(post_save, sender=BedReservation)
+@receiver(post_delete, sender=BedReservation)
+def invalidate_property_facets(sender, **kwargs):
+    """
+    Drops the cached property facets once the change is committed. The beds & reservations
+    are behind the availability filters of the facets, their counters are updated with
+    `queryset.update(...)` & invalidate on their own | see `update_bed_counters`.
+    """
+
+    invalidate_cached_property_facets()
+
+
+@receiver(post_delete, sender=PropertyRoomType)
+def subtract_bed_counters(sender, instance, **kwargs):
+    """Takes the beds & rooms of the deleted room type off the counters of its property."""
+
+    roll_up_property_bed_counters([instance.property_id])
+
+
+@receiver(post_delete, sender=PropertyRoomType)
+def invalidate_bed_inventory(sender, instance, **kwargs):
+    """Drops the free beds bitmap of the deleted room type once the delete is committed."""
+
+    property_id, room_type_id = instance.property_id, instance.room_type_id
+    transaction.on_commit(lambda: bed_inventory.invalidate(property_id, room_type_id))
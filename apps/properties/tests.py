@@ -0,0 +1,847 @@
+import contextlib
+import csv
+import datetime
+import inspect
+import io
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from apps.access.models.user import User
+from apps.common.pagination import EstimatedCountPaginator
+from apps.common.renderers import AppCSVRenderer
+from apps.common.response_cache import response_cache_registry
+from apps.common.serializers import AppReadOnlyModelSerializer, parse_sparse_fields, trim_serializer_fields
+from apps.common.spatial_index import SpatialIndex
+from apps.properties.allocation import FillFirstBedAllocation
+from apps.properties.models.booking import BedReservation, Booking
+from apps.properties.models.properties import (
+    Amenity,
+    Bed,
+    Property,
+    PropertyAmenity,
+    PropertyRoomType,
+    PropertyScheduleVisit,
+    Room,
+    RoomType,
+    TimeSlot,
+)
+from apps.properties.serializers import properties as property_serializers
+from apps.properties.utils import (
+    BED_COUNTER_DRIFT_KEY,
+    PROPERTY_FACETS_VERSION_KEY,
+    allocate_bed,
+    bed_inventory,
+    get_nearby_properties,
+    get_stay_period,
+    has_available_beds,
+    property_index,
+    release_bed,
+    roll_up_property_bed_counters,
+    sync_bed_occupancy,
+    write_property_snapshot,
+)
+from apps.properties.views.properties import PropertiesListViewSet
+
+
+def create_property(index, **kwargs):
+    """Creates the `index`th property of the tests."""
+
+    return Property.objects.create(
+        **{
+            "name": f"Property {index}",
+            "city": "Chennai",
+            "area": f"Area {index}",
+            "location": f"Location {index}",
+            "latitude": Decimal("12.97") + index,
+            "longitude": Decimal("77.59") + index,
+            "janitor": f"Janitor {index}",
+            "address": f"Address {index}",
+            "phone_number": f"+91980000010{index}",
+            "gender": "male",
+            "email": f"property-{index}@example.com",
+            **kwargs,
+        }
+    )
+
+
+# read serializers that need the model instances, listed using the regular path
+VALUES_PLAN_NOT_SUPPORTED = ["TimeSlotListSerializer", "ScheduleVistListSerilizer"]
+
+
+class ValuesSerializerParityTestCase(TestCase):
+    """The fast mode (`.values()`) of the read serializers gives the same output as the regular path."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(email="guest@example.com", phone_number="+919800000000", role="guest")
+        amenities = [Amenity.objects.create(name=name) for name in ["Wifi", "Laundry", "Gym"]]
+        room_types = [
+            RoomType.objects.create(name=name, capacity=capacity)
+            for name, capacity in [("single occupancy", 1), ("double occupancy", 2)]
+        ]
+        time_slot = TimeSlot.objects.create(start_time=datetime.time(9), end_time=datetime.time(10, 30))
+
+        for index in range(4):
+            _property = create_property(
+                index, city="Chennai" if index % 2 else "Bangalore", gender="male" if index % 2 else "female"
+            )
+            # the last property has no amenities & room types
+            if index == 3:
+                continue
+
+            for amenity in amenities[: index + 1]:
+                PropertyAmenity.objects.create(property=_property, amenity=amenity)
+            for room_type in room_types[: index + 1]:
+                PropertyRoomType.objects.create(
+                    property=_property,
+                    room_type=room_type,
+                    number_of_rooms=index + 1,
+                    price_per_month=Decimal("4999.50") * (index + 1),
+                    total_capacity=None if index == 0 else (index + 1) * room_type.capacity,
+                )
+            PropertyScheduleVisit.objects.create(
+                property=_property, user=user, time_slot=time_slot, date=timezone.now() + datetime.timedelta(days=1)
+            )
+
+    def get_read_serializers(self):
+        """Returns all the read serializers of the properties app."""
+
+        return [
+            serializer
+            for _, serializer in inspect.getmembers(property_serializers, inspect.isclass)
+            if issubclass(serializer, AppReadOnlyModelSerializer)
+            and serializer.__module__ == property_serializers.__name__
+        ]
+
+    def test_values_plan_support(self):
+        """Every read serializer except the ones with method fields is compiled."""
+
+        for serializer in self.get_read_serializers():
+            with self.subTest(serializer=serializer.__name__):
+                if serializer.__name__ in VALUES_PLAN_NOT_SUPPORTED:
+                    self.assertIsNone(serializer.get_values_plan())
+                else:
+                    self.assertIsNotNone(serializer.get_values_plan())
+
+    def test_values_parity(self):
+        """Fast mode output is the same as the regular serializer, for every read serializer."""
+
+        for serializer in self.get_read_serializers():
+            with self.subTest(serializer=serializer.__name__):
+                queryset = serializer.Meta.model.objects.all()
+                self.assertTrue(queryset.exists())
+                self.assertEqual(
+                    [dict(_) for _ in serializer(queryset, many=True).data],
+                    serializer.serialize_queryset(queryset),
+                )
+
+    def test_values_query_count(self):
+        """The fast mode takes one query for the rows and one per many relation."""
+
+        with CaptureQueriesContext(connection) as context:
+            property_serializers.PropertyListSerializer.serialize_queryset(Property.objects.all())
+
+        self.assertEqual(len(context), 3)
+
+    def test_values_parity_sparse_fields(self):
+        """Fast mode output is the same as the regular serializer, trimmed to a sparse fieldset."""
+
+        sparse_fields = parse_sparse_fields("id,name,related_property_room_types.price_per_month")
+        serializer = property_serializers.PropertyListSerializer
+        queryset = Property.objects.all()
+
+        regular = serializer(queryset, many=True)
+        trim_serializer_fields(regular, sparse_fields)
+        plan = serializer.get_values_plan(sparse_fields)
+        self.assertEqual([dict(_) for _ in regular.data], plan.serialize(plan.get_queryset(queryset)))
+
+    def test_parse_sparse_fields(self):
+        self.assertIsNone(parse_sparse_fields(""))
+        self.assertEqual(
+            parse_sparse_fields("name, id,related_property_room_types.price_per_month,"),
+            (("id", None), ("name", None), ("related_property_room_types", (("price_per_month", None),))),
+        )
+        # a nested field requested as a whole stays whole
+        for fields in ["rooms,rooms.number", "rooms.number,rooms"]:
+            self.assertEqual(parse_sparse_fields(fields), (("rooms", None),))
+
+
+class ConditionalGetTestCase(TestCase):
+    """The opted in views answer `If-None-Match` with a 304, without counting the rows."""
+
+    url = "/v1/properties/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="guest@example.com", phone_number="+919800000000", role="guest")
+        cls.property = create_property(0)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_not_modified_from_the_response_cache(self):
+        """The `ETag` of the cached views is known before the response, the 304 takes no query."""
+
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # as on the commit of a change | see `ResponseCacheRegistry.handle_change`
+        response_cache_registry.invalidate(Property)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_not_cached(self):
+        """The `ETag` is made of the version of the cached responses, the views opting in cache them."""
+
+        with self.assertRaises(AssertionError):
+            type("NotCachedViewSet", (PropertiesListViewSet,), {"cache_responses": False})
+
+        with mock.patch.object(PropertiesListViewSet, "cache_responses", False):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+
+    @mock.patch.object(PropertiesListViewSet, "etag_actions", [])
+    def test_not_opted_in(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+
+
+@mock.patch.object(PropertiesListViewSet, "cache_responses", False)
+class PaginationTestCase(TestCase):
+    """The pagination modes of the list views, none of them counts the rows of a big table."""
+
+    url = "/v1/properties/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="guest@example.com", phone_number="+919800000000", role="guest")
+        cls.properties = [create_property(index) for index in range(5)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        """Returns the data of the list response & the queries it took."""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data["data"], context
+
+    def test_cursor(self):
+        """Every page seeks from the cursor, the same queries for the deep pages & no `COUNT`."""
+
+        data, first = self.get(self.url, pagination="cursor", **{"page-size": 2})
+        self.assertFalse([_ for _ in first.captured_queries if "COUNT(" in _["sql"]])
+        self.assertIsNone(data["previous"])
+
+        pages = [[_["id"] for _ in data["results"]]]
+        while data["next"]:
+            with self.assertNumQueries(len(first)):
+                data, _ = self.get(data["next"])
+            pages.append([_["id"] for _ in data["results"]])
+
+        expected = sorted(self.properties, key=lambda _: (_.created_at, _.id), reverse=True)
+        self.assertEqual(pages, [[_.id for _ in expected[i : i + 2]] for i in range(0, 5, 2)])  # noqa: E203
+
+        # back from the last page
+        data, _ = self.get(data["previous"])
+        self.assertEqual([_["id"] for _ in data["results"]], pages[1])
+
+    def test_estimated_count(self):
+        """Above the threshold the planner estimate is sent, with no `COUNT` & one more row for the next link."""
+
+        with mock.patch.object(EstimatedCountPaginator, "get_estimated_count", return_value=20000):
+            data, context = self.get(self.url, pagination="estimated", **{"page-size": 2})
+            self.assertEqual((data["count"], data["count_is_estimated"], len(data["results"])), (20000, True, 2))
+            self.assertIsNotNone(data["next"])
+            self.assertFalse([_ for _ in context.captured_queries if "COUNT(" in _["sql"]])
+            self.assertIn("LIMIT 3", context.captured_queries[0]["sql"])
+
+            # the last page, known from the rows fetched
+            with self.assertNumQueries(len(context)):
+                data, _ = self.get(self.url, pagination="estimated", page=3, **{"page-size": 2})
+            self.assertEqual((len(data["results"]), data["next"]), (1, None))
+
+    def test_estimated_count_below_threshold(self):
+        """The small lists still get the exact count."""
+
+        with mock.patch.object(EstimatedCountPaginator, "get_estimated_count", return_value=5):
+            data, context = self.get(self.url, pagination="estimated", **{"page-size": 2})
+        self.assertEqual((data["count"], data["count_is_estimated"]), (5, False))
+        self.assertTrue([_ for _ in context.captured_queries if "COUNT(" in _["sql"]])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"pagination": "cursor", "cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+
+class ExportTestCase(TestCase):
+    """The admins stream the whole list as NDJSON or CSV, on the views that opt in."""
+
+    url = "/v1/properties/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(email="admin@example.com", phone_number="+919800000001", role="admin")
+        cls.guest = User.objects.create(email="guest@example.com", phone_number="+919800000000", role="guest")
+        cls.properties = [create_property(index) for index in range(3)]
+
+    def get(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(self.url, params)
+
+    def test_export(self):
+        response = self.get(self.admin, format="ndjson", ordering="name")
+        self.assertEqual(response.status_code, 200)
+        rows = [orjson.loads(_) for _ in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([_["name"] for _ in rows], [_.name for _ in self.properties])
+
+        response = self.get(self.admin, format="csv", fields="id,name", search="Property 1")
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows, [["id", "name"], [str(self.properties[1].id), "Property 1"]])
+
+    def test_not_allowed(self):
+        """Not paginated, so not found for the other roles & the views that do not opt in."""
+
+        self.assertEqual(self.get(self.guest, format="csv").status_code, 404)
+        with mock.patch.object(PropertiesListViewSet, "export_enabled", False):
+            self.assertEqual(self.get(self.admin, format="csv").status_code, 404)
+        self.assertEqual(self.get(self.guest).status_code, 200)
+
+    def test_csv_columns(self):
+        """The columns are the ones of the serializer, whatever the first row holds."""
+
+        class RoomTypeSerializer(serializers.Serializer):
+            name = serializers.CharField()
+            capacity = serializers.IntegerField()
+
+        class RowSerializer(serializers.Serializer):
+            id = serializers.IntegerField()
+            room_type = RoomTypeSerializer(allow_null=True)
+            tags = serializers.ListField()
+            meta = serializers.JSONField()
+
+        rows = [
+            {"id": 1, "room_type": None, "tags": [], "meta": {"floor": 1}},
+            {"id": 2, "room_type": {"name": "single", "capacity": 1}, "tags": ["ac"], "meta": None},
+        ]
+        content = b"".join(AppCSVRenderer().render_rows(rows, serializer=RowSerializer())).decode()
+        self.assertEqual(
+            list(csv.reader(io.StringIO(content))),
+            [
+                ["id", "room_type.name", "room_type.capacity", "tags", "meta"],
+                ["1", "", "", "[]", '{"floor":1}'],
+                ["2", "single", "1", '["ac"]', ""],
+            ],
+        )
+        content = b"".join(AppCSVRenderer().render_rows([], serializer=RowSerializer())).decode()
+        self.assertEqual(content.strip(), "id,room_type.name,room_type.capacity,tags,meta")
+
+
+class ResponseCacheTestCase(TestCase):
+    """The cached responses are sent with no query & dropped on the commit of a change."""
+
+    url = "/v1/properties/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="guest@example.com", phone_number="+919800000000", role="guest")
+        cls.property = create_property(0)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_names(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [_["name"] for _ in response.data["data"]["results"]]
+
+    def test_hit(self):
+        self.assertEqual(self.get_names(self.url), ["Property 0"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_names(self.url), ["Property 0"])
+
+        # cached per query params
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.get_names(self.url, gender="female"), [])
+        self.assertTrue(context.captured_queries)
+
+    def test_invalidation(self):
+        self.get_names(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.name = "Renamed"
+            self.property.save()
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.get_names(self.url), ["Renamed"])
+        self.assertTrue(context.captured_queries)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_names(self.url), ["Renamed"])
+
+    def test_invalidation_on_commit(self):
+        """Not dropped before the commit, the old rows could be cached again meanwhile."""
+
+        self.get_names(self.url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            create_property(1)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.get_names(self.url), ["Property 0"])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(sorted(self.get_names(self.url)), ["Property 0", "Property 1"])
+
+    def test_invalidation_after_savepoint_rollback(self):
+        """The change after a rolled back one is still invalidated on the commit."""
+
+        self.get_names(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            with contextlib.suppress(RuntimeError), transaction.atomic():
+                create_property(1)
+                raise RuntimeError
+            self.property.name = "Renamed"
+            self.property.save()
+
+        self.assertEqual(self.get_names(self.url), ["Renamed"])
+
+
+class PropertyIndexTestCase(TestCase):
+    """The nearby lookups are answered from the `property_index`, built once & kept up to date."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.properties = [
+            create_property(
+                index,
+                latitude=Decimal("12.97") + Decimal(index) / 100,
+                longitude=Decimal("77.59") + Decimal(index) / 10000,
+            )
+            for index in range(4)
+        ]
+
+    def setUp(self):
+        property_index.reset()
+        self.addCleanup(property_index.reset)
+        # no snapshot unless a test writes one
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+        snapshot_path = os.path.join(snapshot_dir.name, "properties.npy")
+        patcher = mock.patch.object(property_index, "snapshot_path", snapshot_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_nearby_ids(self, radius=3):
+        return [_["id"] for _ in get_nearby_properties(12.969, 77.59, radius)]
+
+    def test_nearby(self):
+        """The index is built from the database once, the lookups take no query."""
+
+        with self.assertNumQueries(1):
+            ids = self.get_nearby_ids()
+        self.assertEqual(ids, [_.id for _ in self.properties[:3]])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_nearby_ids(radius=1), ids[:1])
+            self.assertEqual(self.get_nearby_ids(radius=100), [_.id for _ in self.properties])
+
+    def test_changes(self):
+        """The changes are applied to the built index once committed, with no rebuild."""
+
+        self.get_nearby_ids()
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = self.properties[0]
+            moved.latitude = Decimal("13.97")
+            moved.save()
+            added = create_property(4, latitude=Decimal("12.969"), longitude=Decimal("77.591"))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_nearby_ids(), [added.id, *[_.id for _ in self.properties[1:3]]])
+
+    @mock.patch.dict(settings.APP_SWITCHES, {"CELERY_WORKER_DEBUG_MODE": True})
+    def test_snapshot_reload(self):
+        """The other processes map the snapshot & reload it once it is written again."""
+
+        self.assertEqual(write_property_snapshot(), 4)
+        other_process = SpatialIndex(snapshot_path=property_index.snapshot_path, payload_fields=("name", "location"))
+        self.assertEqual(len(other_process.within_radius(12.969, 77.59, radius_km=100)), 4)
+
+        # written again right away on the commit, as the celery worker is not running
+        with self.captureOnCommitCallbacks(execute=True):
+            added = create_property(4, latitude=Decimal("12.969"), longitude=Decimal("77.591"))
+        # picked up by the mtime, which may not have moved on a coarse clock within the test
+        os.utime(property_index.snapshot_path, ns=(0, os.stat(property_index.snapshot_path).st_mtime_ns + 1))
+
+        with self.assertNumQueries(0):
+            places = other_process.within_radius(12.969, 77.59, radius_km=100)
+        self.assertEqual(len(places), 5)
+        self.assertEqual(places[0][1:], (added.id, {"name": "Property 4", "location": "Location 4"}))
+
+
+class SearchTestCase(TestCase):
+    """The `%` search fields of the property list, ranked on the trigram similarity on postgres."""
+
+    url = "/v1/properties/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="guest@example.com", phone_number="+919800000000", role="guest")
+        cls.properties = [
+            create_property(index, name=name)
+            for index, name in enumerate(["Lake Residency", "Lakeview Hostel", "Sunrise Homes"])
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, term):
+        """Returns the names found & the number of queries taken."""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {"search": term})
+        self.assertEqual(response.status_code, 200)
+        return [_["name"] for _ in response.data["data"]["results"]], len(context)
+
+    def test_search(self):
+        names, queries = self.search("sunrise")
+        self.assertEqual(names, ["Sunrise Homes"])
+        # the same queries as the plain list, the match is a part of them
+        cache.clear()
+        self.assertEqual(self.search("")[1], queries)
+
+    @skipUnless(connection.vendor == "postgresql", "pg_trgm is needed")
+    def test_trigram_search(self):
+        """The terms with typos are matched & the results are ranked on the similarity."""
+
+        names, queries = self.search("lakeviw")
+        self.assertEqual(names, ["Lakeview Hostel"])
+        # newest first otherwise
+        self.assertEqual(self.search("lake")[0], ["Lake Residency", "Lakeview Hostel"])
+        cache.clear()
+        self.assertEqual(self.search("")[1], queries)
+
+
+class PropertyFilterSetTestCase(TestCase):
+    """The room type filters match when a single room type of the property satisfies all of them."""
+
+    url = "/v1/properties/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="guest@example.com", phone_number="+919800000000", role="guest")
+        cls.property = create_property(0)
+        # a full double room at 8000 & a triple room with free beds at 12000
+        for name, capacity, price in [("double occupancy", 2, "8000"), ("triple occupancy", 3, "12000")]:
+            serializer = property_serializers.PropertyRoomTypeSerializer(
+                data={
+                    "property": cls.property.id,
+                    "room_type": RoomType.objects.create(name=name, capacity=capacity).id,
+                    "number_of_rooms": 1,
+                    "price_per_month": price,
+                }
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        Bed.objects.filter(room_type__name="double occupancy").update(is_available=False)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_count(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data["data"]["count"]
+
+    def test_room_type_filters(self):
+        for params, count in [
+            ({"max_price": 10000}, 1),
+            ({"max_price": 10000, "has_available_beds": True}, 0),
+            ({"room_type": "double occupancy", "has_available_beds": True}, 0),
+            ({"room_type": "double occupancy", "has_available_beds": False}, 1),
+            ({"room_type": "triple occupancy", "min_price": 10000, "has_available_beds": True}, 1),
+            ({"min_price": 13000}, 0),
+            ({"related_property_room_types__price_per_month": 8000}, 1),
+        ]:
+            with self.subTest(**params):
+                self.assertEqual(self.get_count(**params), count)
+
+    def test_query(self):
+        """A single `EXISTS` per property, no joins & no `DISTINCT`, the same queries as the plain list."""
+
+        with CaptureQueriesContext(connection) as context:
+            self.get_count()
+        cache.clear()
+        with CaptureQueriesContext(connection) as filtered:
+            self.get_count(room_type="triple occupancy", max_price=20000, has_available_beds=True)
+        self.assertEqual(len(filtered), len(context))
+
+        queries = [_["sql"] for _ in filtered.captured_queries if "EXISTS" in _["sql"]]
+        self.assertTrue(queries)
+        for sql in queries:
+            self.assertNotIn("DISTINCT", sql)
+            self.assertNotIn("JOIN", sql.split("EXISTS")[0])
+
+
+class BedAllocationTestCase(TestCase):
+    """The allocation strategies fill the rooms in their order & keep the counters right."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="guest@example.com", phone_number="+919800000000", role="guest")
+        cls.room_type = RoomType.objects.create(name="triple occupancy", capacity=3)
+        cls.property = create_property(0)
+        serializer = property_serializers.PropertyRoomTypeSerializer(
+            data={
+                "property": cls.property.id,
+                "room_type": cls.room_type.id,
+                "number_of_rooms": 3,
+                "price_per_month": "4999.50",
+            }
+        )
+        serializer.is_valid(raise_exception=True)
+        cls.property_room_type = serializer.save()
+
+    def allocate(self, strategy, count, joining_date=datetime.date(2025, 1, 1), move_out_date=None):
+        """Allocates `count` beds with the strategy, returns their bed numbers."""
+
+        return [
+            allocate_bed(
+                Booking.objects.create(
+                    user=self.user,
+                    property=self.property,
+                    room_type=self.room_type,
+                    joining_date=joining_date,
+                    move_out_date=move_out_date,
+                ),
+                self.user,
+                strategy=strategy,
+            ).bed_number
+            for _ in range(count)
+        ]
+
+    def test_fill_first(self):
+        self.assertEqual(self.allocate("fill_first", 4), ["R 01-BA", "R 01-BB", "R 01-BC", "R 02-BA"])
+
+    def test_spread_out(self):
+        self.assertEqual(self.allocate("spread_out", 4), ["R 01-BA", "R 02-BA", "R 03-BA", "R 01-BB"])
+
+    def test_spread_out_future_stays(self):
+        """The rooms are filled by their reservations over the stay, not by their beds taken today."""
+
+        move_in = timezone.localdate() + datetime.timedelta(days=30)
+        self.assertEqual(self.allocate("spread_out", 4, move_in), ["R 01-BA", "R 02-BA", "R 03-BA", "R 01-BB"])
+
+    @skipUnless(connection.vendor == "postgresql", "the exclusion constraint needs postgres")
+    def test_concurrent_future_stay(self):
+        """The bed reserved by a concurrent allocation after it was picked is given up for another one."""
+
+        move_in = timezone.localdate() + datetime.timedelta(days=30)
+        strategy = FillFirstBedAllocation()
+        get_bed = strategy.get_bed
+
+        def get_reserved_bed(*args):
+            bed = get_bed(*args)
+            if get_bed_calls.append(bed) or len(get_bed_calls) == 1:
+                # the concurrent allocation commits between the pick & the reservation
+                BedReservation.objects.create(bed=bed, period=get_stay_period(move_in))
+            return bed
+
+        get_bed_calls = []
+
+        with mock.patch.object(strategy, "get_bed", side_effect=get_reserved_bed), mock.patch(
+            "apps.properties.utils.get_bed_allocation_strategy", return_value=strategy
+        ):
+            self.assertEqual(self.allocate("fill_first", 1, move_in), ["R 01-BB"])
+        self.assertEqual([_.bed_number for _ in get_bed_calls], ["R 01-BA", "R 01-BB"])
+        self.assertEqual(BedReservation.objects.filter(bed__bed_number="R 01-BA").count(), 1)
+
+    def test_counters(self):
+        """The room occupancy & the room type and property counters follow the allocations."""
+
+        self.allocate("random", 5)
+        # rolled up on the beat, out of the allocations
+        self.assertEqual(roll_up_property_bed_counters(), 1)
+
+        rooms = Room.objects.filter(property_room_type=self.property_room_type)
+        self.assertEqual(sum(rooms.values_list("occupied_beds_count", flat=True)), 5)
+        vacant_rooms = rooms.filter(occupied_beds_count__lt=3).count()
+        for instance in [
+            PropertyRoomType.objects.get(id=self.property_room_type.id),
+            Property.objects.get(id=self.property.id),
+        ]:
+            self.assertEqual(
+                (instance.available_beds_count, instance.occupied_beds_count, instance.vacant_rooms_count),
+                (4, 5, vacant_rooms),
+            )
+
+    def test_future_stays(self):
+        """The beds are reserved for the stay only & taken on the move in."""
+
+        move_in = timezone.localdate() + datetime.timedelta(days=30)
+        move_out = move_in + datetime.timedelta(days=30)
+        self.assertEqual(self.allocate("fill_first", 9, move_in, move_out), self.allocate("fill_first", 9, move_out))
+        self.assertEqual(self.allocate("fill_first", 1, timezone.localdate(), move_in), ["R 01-BA"])
+
+        self.assertFalse(has_available_beds(self.property.id, self.room_type.id, get_stay_period(move_in)))
+        self.assertTrue(has_available_beds(self.property.id, self.room_type.id))
+        self.assertEqual(PropertyRoomType.objects.get(id=self.property_room_type.id).available_beds_count, 8)
+
+        rooms = Room.objects.filter(property_room_type=self.property_room_type).order_by("room_number")
+        self.assertEqual(list(rooms.values_list("reservations_count", flat=True)), [7, 6, 6])
+
+        # the stay till the move in has ended, its room is taken off
+        self.assertEqual(sync_bed_occupancy(move_in), {"occupied": 8, "handed_over": 0, "released": 0, "rooms": 1})
+        self.assertEqual(PropertyRoomType.objects.get(id=self.property_room_type.id).available_beds_count, 0)
+        self.assertEqual(list(rooms.values_list("reservations_count", flat=True)), [6, 6, 6])
+
+    def test_reconcile(self):
+        """The drifted counters are fixed along with the `modified_at` & `is_bed_available`."""
+
+        modified_at = PropertyRoomType.objects.get(id=self.property_room_type.id).modified_at
+        Room.objects.filter(property_room_type=self.property_room_type).update(
+            occupied_beds_count=2, reservations_count=5
+        )
+        PropertyRoomType.objects.filter(id=self.property_room_type.id).update(
+            available_beds_count=0, is_bed_available=False
+        )
+        Property.objects.filter(id=self.property.id).update(occupied_beds_count=4)
+
+        call_command("reconcile_bed_counters", stdout=StringIO())
+
+        rooms = Room.objects.filter(property_room_type=self.property_room_type)
+        self.assertEqual(list(rooms.values_list("occupied_beds_count", "reservations_count")), [(0, 0)] * 3)
+        property_room_type = PropertyRoomType.objects.get(id=self.property_room_type.id)
+        self.assertEqual((property_room_type.available_beds_count, property_room_type.is_bed_available), (9, True))
+        self.assertGreater(property_room_type.modified_at, modified_at)
+        _property = Property.objects.get(id=self.property.id)
+        self.assertEqual((_property.available_beds_count, _property.occupied_beds_count), (9, 0))
+
+    def test_counters_drift(self):
+        """A counter drifted below the change is kept at 0, the allocation goes on & the drift is reported."""
+
+        cache.clear()
+        PropertyRoomType.objects.filter(id=self.property_room_type.id).update(occupied_beds_count=0)
+        Room.objects.filter(property_room_type=self.property_room_type).update(occupied_beds_count=0)
+        bed = Bed.objects.get(bed_number="R 01-BA")
+        Bed.objects.filter(id=bed.id).update(is_available=False)
+
+        release_bed(bed, self.property.id)
+        self.assertEqual(cache.get(BED_COUNTER_DRIFT_KEY), 2)
+        property_room_type = PropertyRoomType.objects.get(id=self.property_room_type.id)
+        self.assertEqual((property_room_type.available_beds_count, property_room_type.occupied_beds_count), (10, 0))
+
+        call_command("reconcile_bed_counters", stdout=StringIO())
+        self.assertEqual(cache.get(BED_COUNTER_DRIFT_KEY), 0)
+        self.assertEqual(PropertyRoomType.objects.get(id=self.property_room_type.id).available_beds_count, 9)
+
+    def test_remove_rooms(self):
+        """The rooms with beds taken or reserved are not removed, the free ones are."""
+
+        def remove_rooms(number_of_rooms):
+            serializer = property_serializers.PropertyRoomTypeSerializer(
+                PropertyRoomType.objects.get(id=self.property_room_type.id),
+                data={"number_of_rooms": number_of_rooms},
+                partial=True,
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        move_in = timezone.localdate() + datetime.timedelta(days=30)
+        self.assertEqual(self.allocate("fill_first", 7, move_in)[-1], "R 03-BA")
+        with self.assertRaises(ValidationError):
+            remove_rooms(2)
+        self.assertEqual(Bed.objects.filter(property_room_type=self.property_room_type).count(), 9)
+        self.assertEqual(BedReservation.objects.filter(bed__bed_number="R 03-BA").count(), 1)
+
+        BedReservation.objects.filter(bed__bed_number="R 03-BA").delete()
+        remove_rooms(2)
+        self.assertEqual(Bed.objects.filter(property_room_type=self.property_room_type).count(), 6)
+
+    def test_change_room_type(self):
+        """The beds move to the new room type, the bitmaps of both room types are dropped."""
+
+        # the same bed numbers, the beds are kept
+        room_type = RoomType.objects.create(name="Triple Occupancy", capacity=3)
+        serializer = property_serializers.PropertyRoomTypeSerializer(
+            PropertyRoomType.objects.get(id=self.property_room_type.id), data={"room_type": room_type.id}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        with mock.patch.object(bed_inventory, "invalidate") as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                serializer.save()
+
+        self.assertEqual(
+            sorted(_.args for _ in invalidate.call_args_list),
+            sorted([(self.property.id, self.room_type.id), (self.property.id, room_type.id)]),
+        )
+        beds = Bed.objects.filter(property_room_type=self.property_room_type)
+        self.assertEqual((beds.count(), beds.filter(room_type=room_type).count()), (9, 9))
+
+    def test_facets_invalidated(self):
+        """The cached facets are dropped on the allocations, the counters are updated without signals."""
+
+        version = cache.get(PROPERTY_FACETS_VERSION_KEY, 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.allocate("fill_first", 2)
+            self.assertEqual(cache.get(PROPERTY_FACETS_VERSION_KEY, 0), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertGreater(cache.get(PROPERTY_FACETS_VERSION_KEY), version)
+
+    def test_stay_filters(self):
+        """The properties with a bed free over the stay, the stay is validated."""
+
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        move_in = timezone.localdate() + datetime.timedelta(days=30)
+        move_out = move_in + datetime.timedelta(days=30)
+        self.allocate("fill_first", 9, move_in, move_out)
+
+        def get(**params):
+            return client.get("/v1/properties/", {_: str(value) for _, value in params.items()})
+
+        def get_count(**params):
+            return get(**params).data["data"]["count"]
+
+        self.assertEqual(get_count(move_in_date=move_in), 0)
+        self.assertEqual(get_count(move_in_date=move_in, has_available_beds=False), 1)
+        self.assertEqual(get_count(move_in_date=move_out), 1)
+        self.assertEqual(get_count(move_in_date=timezone.localdate(), move_out_date=move_in), 1)
+
+        self.assertEqual(get(move_out_date=move_out).status_code, 400)
+        self.assertEqual(get(move_in_date=move_out, move_out_date=move_out).status_code, 400)
+        self.assertEqual(get(move_in_date=move_out, move_out_date=move_in).status_code, 400)
@@ -1,44 +1,319 @@
-import random
+import functools
+import hashlib
+import logging
+import math
+import operator
+import os
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import DatabaseError, IntegrityError, transaction
-from django.db.models import Count
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import (
+    BooleanField,
+    Case,
+    CharField,
+    Count,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest, Now
+from django.utils import timezone
 
-from apps.properties.models.properties import Bed
+from apps.access.models.user import User
+from apps.common.cache_bitmap import CacheBitmap
+from apps.common.helpers import (
+    KM_PER_DEGREE_LATITUDE,
+    get_bounding_box,
+    haversine_expression,
+    haversine_vectorized,
+    incr_cache_counter,
+)
+from apps.common.response_cache import response_cache_registry
+from apps.common.spatial_index import SpatialIndex
+from apps.properties.allocation import get_bed_allocation_strategy
+from apps.properties.models.booking import BedReservation
+from apps.properties.models.properties import BED_COUNTER_FIELDS, Bed, Property, PropertyRoomType, Room
 
+logger = logging.getLogger(__name__)
 
-def allocate_bed(booking, user):
-    """Allocate a bed to the user based on availability and booking rules."""
+# places closer than this are the same spot as the given point, rounds to 0.0 km
+MIN_NEARBY_DISTANCE_KM = 0.005
+
+# hit/miss counters of `get_cached_nearby_properties` | see `manage.py nearby_cache_stats`
+NEARBY_CACHE_STAT_KEYS = {
+    "hits": "nearby-cache:hits",
+    "misses": "nearby-cache:misses",
+    "bypasses": "nearby-cache:bypasses",
+}
+# bumped on every property change, for the entries too wide to track per cell
+NEARBY_CACHE_VERSION_KEY = "nearby-cache:version"
+# bumped when the data behind the `property_index` is replaced as a whole
+NEARBY_CACHE_GENERATION_KEY = "nearby-cache:generation"
+
+# allocations that found the bed counters drifted, since the last `manage.py reconcile_bed_counters`
+BED_COUNTER_DRIFT_KEY = "bed-counters:drift"
+
+# beds tried per allocation, when the picked bed is reserved by a concurrent one meanwhile
+BED_ALLOCATION_ATTEMPTS = 3
+
+
+def get_bed_counter_aggregates():
+    """Returns the aggregates of the `BED_COUNTER_FIELDS`, over `Bed` rows."""
+
+    return {
+        "available_beds_count": Count("id", filter=Q(is_available=True)),
+        "occupied_beds_count": Count("id", filter=Q(is_available=False)),
+        "vacant_rooms_count": Count("room", filter=Q(is_available=True), distinct=True),
+    }
+
+
+def get_bed_counters(beds):
+    """Returns the free & occupied beds and the rooms with a free bed, of the given `Bed` queryset."""
+
+    return beds.aggregate(**get_bed_counter_aggregates())
+
+
+def update_bed_counters(property_room_type_id, **deltas):
+    """
+    Adds the given deltas to the `BED_COUNTER_FIELDS` of the property room type. Done with F
+    expressions, in the database, so the concurrent changes are not overwritten. The counters
+    are only a cache, a counter that has drifted below the change is kept at 0 instead of
+    failing the allocation, the drift is reported (`report_bed_counter_drift`) & fixed by
+    `manage.py reconcile_bed_counters`. `queryset.update(...)` sends no signals, the cached
+    responses & facets are invalidated here.
+
+    The counters of the property are rolled up from its room types later on, out of the
+    allocations | see `roll_up_property_bed_counters`.
+    """
+
+    if not any(deltas.values()):
+        return
+
+    queryset = PropertyRoomType.objects.filter(id=property_room_type_id)
+    is_bed_available = ExpressionWrapper(
+        Q(available_beds_count__gt=-deltas.get("available_beds_count", 0)), output_field=BooleanField()
+    )
+    no_drift = {f"{name}__gte": -delta for name, delta in deltas.items() if delta < 0}
+    if not queryset.filter(**no_drift).update(
+        **{name: F(name) + delta for name, delta in deltas.items() if delta},
+        is_bed_available=is_bed_available,
+        modified_at=Now(),
+    ):
+        report_bed_counter_drift(PropertyRoomType, property_room_type_id)
+        queryset.update(
+            **{name: Greatest(F(name) + delta, 0) for name, delta in deltas.items() if delta},
+            is_bed_available=is_bed_available,
+            modified_at=Now(),
+        )
+    response_cache_registry.handle_change(sender=PropertyRoomType)
+    invalidate_cached_property_facets()
+
+
+def report_bed_counter_drift(model, _id):
+    """Logs & counts a bed counter found below the change, shown by `manage.py reconcile_bed_counters`."""
+
+    logger.warning(f"Bed counters of {model.__name__} {_id} have drifted, kept at 0 till reconciled.")
+    incr_cache_counter(BED_COUNTER_DRIFT_KEY)
+
+
+def get_property_bed_counter_totals():
+    """Returns the sums of the `BED_COUNTER_FIELDS` of the room types, as subqueries on `Property`."""
+
+    room_types = PropertyRoomType.objects.filter(property=OuterRef("pk")).order_by().values("property")
+    return {
+        name: Coalesce(Subquery(room_types.annotate(total=Sum(name)).values("total")), 0)
+        for name in BED_COUNTER_FIELDS
+    }
+
+
+def get_stale_property_ids(property_ids=None):
+    """Returns the ids of the properties (all by default) with counters other than the sums of their room types."""
+
+    properties = Property.objects.all() if property_ids is None else Property.objects.filter(id__in=property_ids)
+    totals = {f"{name}_total": total for name, total in get_property_bed_counter_totals().items()}
+    stale = properties.alias(**totals).filter(
+        functools.reduce(operator.or_, [~Q(**{name: F(f"{name}_total")}) for name in BED_COUNTER_FIELDS])
+    )
+    return list(stale.values_list("id", flat=True))
+
+
+def roll_up_property_bed_counters(property_ids=None):
+    """
+    Sets the `BED_COUNTER_FIELDS` of the properties (all by default) to the sums of their
+    room types, only the stale ones are updated. Kept out of the allocations, else the
+    concurrent allocations of a property would all wait on its row. Returns the number of
+    properties updated | run on the celery beat.
+    """
+
+    stale_ids = get_stale_property_ids(property_ids)
+    if not stale_ids:
+        return 0
+
+    count = Property.objects.filter(id__in=stale_ids).update(**get_property_bed_counter_totals(), modified_at=Now())
+    response_cache_registry.handle_change(sender=Property)
+    invalidate_cached_property_facets()
+    return count
+
+
+def refresh_bed_counters(property_room_type):
+    """
+    Counts the beds of the property room type again & adds the difference to the counters.
+    Called after its beds are provisioned or removed.
+    """
+
+    # locked first, the allocations committed after the count still apply their deltas
+    previous = (
+        PropertyRoomType.objects.select_for_update().filter(id=property_room_type.id).values(*BED_COUNTER_FIELDS).get()
+    )
+    counters = get_bed_counters(Bed.objects.filter(property_room_type_id=property_room_type.id))
+    update_bed_counters(
+        property_room_type.id, **{name: counters[name] - previous[name] for name in BED_COUNTER_FIELDS}
+    )
+    roll_up_property_bed_counters([property_room_type.property_id])
+    for name in BED_COUNTER_FIELDS:
+        setattr(property_room_type, name, counters[name])
+    property_room_type.is_bed_available = counters["available_beds_count"] > 0
+
+
+def get_available_beds(_property, room_type):
+    """
+    Returns the available beds of the property & room type, in bed order. There is a single
+    `PropertyRoomType` per property & room type, so these are the beds of one room type.
+    """
+
+    queryset = Bed.objects.filter(property_room_type__property=_property, room_type=room_type, is_available=True)
+    return queryset.order_by("id")
+
+
+def load_bed_inventory_rows(property_id, room_type_id):
+    """Loader for the `bed_inventory`. Called only when the bitmap of the room type is built."""
+
+    queryset = Bed.objects.filter(property_room_type__property_id=property_id, room_type_id=room_type_id)
+    return queryset.order_by("id").values_list("id", "is_available")
+
+
+# kept in sync by `allocate_bed` & the bed provisioning | see PropertyRoomTypeSerializer._update_beds
+bed_inventory = CacheBitmap("bed-inventory", loader=load_bed_inventory_rows, timeout=settings.BED_INVENTORY_TIMEOUT)
+
+
+def get_stay_period(move_in, move_out=None):
+    """Returns the days of the stay, [move in, move out) & open ended if the move out is not known."""
+
+    return DateRange(move_in, move_out, "[)")
+
+
+def has_available_beds(property_id, room_type_id, period=None):
+    """
+    Whether the property has a free bed of the room type, today or over the whole `period`
+    (a `DateRange`) if given. The `bed_inventory` (if enabled) answers for today, the
+    reservations (gist index) for the other windows.
+    """
+
+    if bed_inventory.is_enabled():
+        is_free_today = bed_inventory.first_set(property_id, room_type_id) is not None
+        # the beds taken today are taken in a window covering today as well
+        if period is None or (not is_free_today and period.lower <= timezone.localdate()):
+            return is_free_today
+    if period is None:
+        return get_available_beds(property_id, room_type_id).exists()
+
+    beds = Bed.objects.filter(property_room_type__property_id=property_id, room_type_id=room_type_id)
+    return beds.filter(~Exists(BedReservation.objects.filter(bed=OuterRef("pk"), period__overlap=period))).exists()
+
+
+def occupy_bed(bed, user, property_id):
+    """Marks the bed as taken from today on, along with the bed counters & the `bed_inventory`."""
+
+    bed.is_available = False
+    bed.user = user
+    bed.save(update_fields=["is_available", "user", "modified_at"])
+    # the room row stays locked till the commit, the concurrent allocations of the room wait here
+    Room.objects.filter(id=bed.room_id).update(occupied_beds_count=F("occupied_beds_count") + 1)
+    room_is_full = Room.objects.filter(id=bed.room_id, occupied_beds_count__gte=F("capacity")).exists()
+    update_bed_counters(
+        bed.property_room_type_id,
+        available_beds_count=-1,
+        occupied_beds_count=1,
+        vacant_rooms_count=-1 if room_is_full else 0,
+    )
+    transaction.on_commit(lambda: bed_inventory.set(property_id, bed.room_type_id, member=bed.id, value=False))
+
+
+def release_bed(bed, property_id):
+    """Marks the bed as free from today on, the reverse of `occupy_bed`."""
+
+    bed.is_available = True
+    bed.user = None
+    bed.save(update_fields=["is_available", "user", "modified_at"])
+    if not Room.objects.filter(id=bed.room_id, occupied_beds_count__gt=0).update(
+        occupied_beds_count=F("occupied_beds_count") - 1
+    ):
+        # kept at 0
+        report_bed_counter_drift(Room, bed.room_id)
+    room_was_full = Room.objects.filter(id=bed.room_id, occupied_beds_count__gte=F("capacity") - 1).exists()
+    update_bed_counters(
+        bed.property_room_type_id,
+        available_beds_count=1,
+        occupied_beds_count=-1,
+        vacant_rooms_count=1 if room_was_full else 0,
+    )
+    transaction.on_commit(lambda: bed_inventory.set(property_id, bed.room_type_id, member=bed.id, value=True))
+
+
+def reserve_bed(booking, period, strategy):
+    """Reserves a bed picked by the `strategy` for the booking over the `period`. Returns the bed, None if none."""
+
+    for _ in range(BED_ALLOCATION_ATTEMPTS):
+        bed = strategy.get_bed(booking.property_id, booking.room_type_id, period)
+        if not bed:
+            return None
+        try:
+            # a savepoint, the transaction goes on after a refused reservation
+            with transaction.atomic():
+                BedReservation.objects.create(bed=bed, booking=booking, period=period)
+        except IntegrityError as exc:
+            if getattr(getattr(exc.__cause__, "diag", None), "constraint_name", None) != "bed_reservation_no_overlap":
+                raise
+            continue
+        return bed
+
+    return None
+
+
+def allocate_bed(booking, user, strategy=None):
+    """
+    Allocate a bed to the user based on availability and booking rules. The bed is picked by
+    the allocation `strategy` (name), `BED_ALLOCATION_STRATEGY` by default. Only the picked
+    bed is locked, the concurrent allocations for the same property move on to another bed
+    instead of waiting on each other.
+
+    The bed is reserved from the move in to the move out of the booking & taken right away
+    if the user moves in today, else on the move in by `sync_bed_occupancy`.
+
+    The free beds are found on the snapshot of the statement, a concurrent allocation can
+    reserve the same bed for an overlapping stay & commit meanwhile. The reservation is then
+    refused by the `bed_reservation_no_overlap` constraint & another bed is picked, up to
+    `BED_ALLOCATION_ATTEMPTS` times.
+    """
     try:
         with transaction.atomic():
-            available_beds = Bed.objects.select_for_update().filter(
-                property_room_type__property=booking.property, room_type=booking.room_type, is_available=True
-            )
-            if not available_beds.exists():
-                raise Exception("No available beds in this property and room type.")
-            total_rooms = booking.property.related_property_room_types.filter(room_type=booking.room_type).count()
-            total_empty_rooms = available_beds.values("property_room_type").distinct().count()
-            bed = None
-            if total_empty_rooms == total_rooms:
-                bed = available_beds.first()
-            else:
-                vacant_rooms = (
-                    available_beds.values("property_room_type")
-                    .annotate(available_count=Count("id"))
-                    .order_by("-available_count")
-                )
-                if vacant_rooms.exists():
-                    room_id = vacant_rooms.first()["property_room_type"]
-                    bed = available_beds.filter(property_room_type_id=room_id).first()
-                elif available_beds.count() > 1:
-                    bed = random.choice(list(available_beds))
-                else:
-                    bed = available_beds.first()
+            period = get_stay_period(booking.joining_date, booking.move_out_date)
+            bed = reserve_bed(booking, period, get_bed_allocation_strategy(strategy))
             if not bed:
-                raise Exception("Bed allocation failed. No suitable bed found.")
-            bed.is_available = False
-            bed.user = user
-            bed.save()
+                raise Exception("No available beds in this property and room type.")
+            # the order of the rooms for the next allocations, taken off once the stay ends
+            Room.objects.filter(id=bed.room_id).update(reservations_count=F("reservations_count") + 1)
+            if booking.joining_date <= timezone.localdate():
+                occupy_bed(bed, user, booking.property_id)
             booking.bed = bed
             booking.status = "allotted"
             booking.save()
@@ -49,3 +324,350 @@ def allocate_bed(booking, user):
         raise Exception("Required object not found.")
     except Exception:
         raise
+
+
+def sync_bed_occupancy(date=None):
+    """
+    Takes the beds reserved on the `date` (today by default), hands the beds over to the
+    user moving in & frees the beds not reserved anymore, `Bed.is_available` & `Bed.user`
+    follow the reservations. Run daily, returns the number of beds taken, handed over & freed.
+    """
+
+    date = date or timezone.localdate()
+    reserved = BedReservation.objects.filter(bed=OuterRef("pk"), period__contains=date)
+    beds = Bed.objects.select_related("property_room_type").annotate(
+        reserved_user_id=Subquery(reserved.values("booking__user")[:1])
+    )
+    to_occupy = beds.filter(Exists(reserved)).filter(
+        Q(is_available=True) | ~Q(user_id=F("reserved_user_id"), reserved_user_id__isnull=False)
+    )
+    to_release = beds.filter(~Exists(reserved), is_available=False)
+
+    counts = {"occupied": 0, "handed_over": 0, "released": 0}
+    for bed in to_occupy.order_by("id"):
+        with transaction.atomic():
+            # the bed as of now, it could have been allocated meanwhile
+            is_available = Bed.objects.select_for_update().values_list("is_available", flat=True).get(id=bed.id)
+            user_id = bed.reserved_user_id
+            if is_available:
+                occupy_bed(bed, User.objects.filter(id=user_id).first(), bed.property_room_type.property_id)
+                counts["occupied"] += 1
+            elif user_id and bed.user_id != user_id:
+                Bed.objects.filter(id=bed.id).update(user_id=user_id, modified_at=Now())
+                counts["handed_over"] += 1
+    for bed in to_release.order_by("id"):
+        with transaction.atomic():
+            if not Bed.objects.select_for_update().filter(id=bed.id, is_available=False).exists():
+                continue
+            release_bed(bed, bed.property_room_type.property_id)
+            counts["released"] += 1
+    counts["rooms"] = refresh_room_reservations_counts(date)
+    return counts
+
+
+def get_room_reservations_count(date):
+    """Expression over the rooms, the reservations of their beds not ended by the `date`."""
+
+    reservations = (
+        BedReservation.objects.filter(bed__room=OuterRef("pk"), period__overlap=get_stay_period(date))
+        .order_by()
+        .values("bed__room")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    return Coalesce(Subquery(reservations), 0)
+
+
+def refresh_room_reservations_counts(date=None):
+    """
+    Sets the `Room.reservations_count` to the reservations not ended by the `date` (today by
+    default), the ended & the deleted ones are taken off. Only the changed rooms are updated,
+    returns their count | run daily by `sync_bed_occupancy`.
+    """
+
+    expected = get_room_reservations_count(date or timezone.localdate())
+    return (
+        Room.objects.annotate(expected=expected)
+        .exclude(reservations_count=F("expected"))
+        .update(reservations_count=expected, modified_at=Now())
+    )
+
+
+def get_property_index_row(instance):
+    """Returns the `property_index` row for the given property."""
+
+    return (
+        instance.id,
+        float(instance.latitude),
+        float(instance.longitude),
+        {"name": instance.name, "location": instance.location},
+    )
+
+
+def load_property_index_rows():
+    """Loader for the `property_index`. Called only when the index is built."""
+
+    return (
+        get_property_index_row(_)
+        for _ in Property.objects.only("id", "name", "location", "latitude", "longitude").order_by().iterator()
+    )
+
+
+# kept up to date by the `Property` signals | see apps.properties.signals
+property_index = SpatialIndex(
+    loader=load_property_index_rows,
+    version_key="property-index:version",
+    snapshot_path=os.path.join(settings.GEO_SNAPSHOT_DIR, "properties.npy"),
+    payload_fields=("name", "location"),
+)
+
+
+def write_property_snapshot():
+    """Generates the shared `property_index` snapshot from the database. Returns the count."""
+
+    count = property_index.write_snapshot(load_property_index_rows())
+    incr_cache_counter(NEARBY_CACHE_GENERATION_KEY)
+    return count
+
+
+def schedule_property_snapshot():
+    """
+    Generates the `property_index` snapshot again in the background, if one is in use. The
+    changes within `GEO_SNAPSHOT_REFRESH_DELAY` are grouped in to a single run. Until then
+    the changes are seen only by the process that made them. Written right away when the
+    celery worker is not running.
+    """
+
+    from apps.common.task import write_property_geo_snapshot
+
+    delay = settings.GEO_SNAPSHOT_REFRESH_DELAY
+    if not os.path.exists(property_index.snapshot_path):
+        return
+
+    if settings.APP_SWITCHES["CELERY_WORKER_DEBUG_MODE"]:
+        write_property_snapshot()
+    elif cache.add("property-index:snapshot-scheduled", True, timeout=delay):
+        write_property_geo_snapshot.apply_async(countdown=delay)
+
+
+def get_nearby_properties(latitude, longitude, radius, limit=None, offset=0):
+    """
+    Returns the properties within `radius` km of the given point, nearest first. Answered
+    from the in-process `property_index`, so the database is not queried per request.
+    """
+
+    if limit:
+        places = property_index.nearest(
+            latitude,
+            longitude,
+            k=offset + limit,
+            max_distance_km=radius,
+            min_distance_km=MIN_NEARBY_DISTANCE_KM,
+        )[offset:]
+    else:
+        places = property_index.within_radius(
+            latitude, longitude, radius_km=radius, min_distance_km=MIN_NEARBY_DISTANCE_KM
+        )[offset:]
+
+    return [{"id": _id, **payload, "distance_km": round(distance, 2)} for distance, _id, payload in places]
+
+
+def get_nearby_cache_cell_key(latitude, longitude):
+    """Returns the version key of the invalidation cell that holds the given point."""
+
+    size = settings.NEARBY_PROPERTIES_CACHE["INVALIDATION_CELL_SIZE"]
+    return f"nearby-cache:version:{math.floor(latitude / size)}:{math.floor(longitude / size)}"
+
+
+def get_nearby_cache_version_keys(latitude, longitude, radius):
+    """
+    Returns the version keys that the cached candidates within `radius` km of the given point
+    depend on. These are the invalidation cells under the bounding box, or the global version
+    if the box spans too many cells.
+    """
+
+    config = settings.NEARBY_PROPERTIES_CACHE
+    size = config["INVALIDATION_CELL_SIZE"]
+    min_lat, max_lat, min_lon, max_lon = get_bounding_box(latitude, longitude, radius)
+    if min_lon is None:
+        return [NEARBY_CACHE_GENERATION_KEY, NEARBY_CACHE_VERSION_KEY]
+
+    lat_cells = range(math.floor(min_lat / size), math.floor(max_lat / size) + 1)
+    lon_cells = range(math.floor(min_lon / size), math.floor(max_lon / size) + 1)
+    if len(lat_cells) * len(lon_cells) > config["MAX_INVALIDATION_CELLS"]:
+        return [NEARBY_CACHE_GENERATION_KEY, NEARBY_CACHE_VERSION_KEY]
+
+    return [NEARBY_CACHE_GENERATION_KEY, *[f"nearby-cache:version:{a}:{b}" for a in lat_cells for b in lon_cells]]
+
+
+def invalidate_nearby_cache(*locations):
+    """
+    Invalidates the cached nearby lookups around the given (latitude, longitude) locations.
+    Called with both the old & new locations of the changed properties.
+    """
+
+    incr_cache_counter(NEARBY_CACHE_VERSION_KEY)
+    for key in {get_nearby_cache_cell_key(float(lat), float(lon)) for lat, lon in locations}:
+        incr_cache_counter(key)
+
+
+def get_cached_nearby_properties(latitude, longitude, radius, limit=None, offset=0):
+    """
+    Cached version of `get_nearby_properties`. Lookups are grouped by the tile of the given
+    point & the radius rounded up to a bucket. The candidates within the bucket radius of
+    the whole tile are cached, the distances from the exact point are calculated per lookup,
+    so the results are the same as `get_nearby_properties`.
+
+    Entries are invalidated on any `Property` change in the cells under them, see
+    `invalidate_nearby_cache`. Radiuses above the largest bucket are not cached.
+    """
+
+    config = settings.NEARBY_PROPERTIES_CACHE
+    latitude, longitude = float(latitude), float(longitude)
+    bucket = next((_ for _ in config["RADIUS_BUCKETS"] if _ >= radius), None)
+    if bucket is None:
+        incr_cache_counter(NEARBY_CACHE_STAT_KEYS["bypasses"])
+        return get_nearby_properties(latitude, longitude, radius, limit=limit, offset=offset)
+
+    size = config["TILE_SIZE"]
+    tile = math.floor(latitude / size), math.floor(longitude / size)
+    tile_latitude, tile_longitude = (tile[0] + 0.5) * size, (tile[1] + 0.5) * size
+    # anywhere in the tile is within half the diagonal from its center
+    candidate_radius = bucket + KM_PER_DEGREE_LATITUDE * size * math.sqrt(2) / 2
+
+    version_keys = get_nearby_cache_version_keys(tile_latitude, tile_longitude, candidate_radius)
+    versions = cache.get_many(version_keys)
+    signature = hashlib.md5(":".join(str(versions.get(_, 0)) for _ in version_keys).encode()).hexdigest()
+    key = f"nearby-cache:{size}:{tile[0]}:{tile[1]}:{bucket}:{signature}"
+
+    candidates = cache.get(key)
+    if candidates is None:
+        incr_cache_counter(NEARBY_CACHE_STAT_KEYS["misses"])
+        candidates = [
+            (_id, lat, lon, payload)
+            for _, _id, payload, lat, lon in property_index.within_radius(
+                tile_latitude, tile_longitude, radius_km=candidate_radius, with_coordinates=True
+            )
+        ]
+        cache.set(key, candidates, timeout=config["TIMEOUT"])
+    else:
+        incr_cache_counter(NEARBY_CACHE_STAT_KEYS["hits"])
+
+    distances = haversine_vectorized(
+        latitude, longitude, [_[1] for _ in candidates], [_[2] for _ in candidates]
+    ).tolist()
+    places = sorted(
+        (distance, _id, payload)
+        for distance, (_id, _, _, payload) in zip(distances, candidates)
+        if MIN_NEARBY_DISTANCE_KM <= distance <= radius
+    )
+    places = places[offset : offset + limit] if limit else places[offset:]  # noqa: E203
+
+    return [{"id": _id, **payload, "distance_km": round(distance, 2)} for distance, _id, payload in places]
+
+
+def query_nearby_properties(latitude, longitude, radius, limit=None, offset=0):
+    """
+    Database version of `get_nearby_properties`. The bounding box narrows down the rows
+    using the lat/long index and the haversine annotation does the exact filtering,
+    ordering and slicing in the database.
+    """
+
+    min_lat, max_lat, min_lon, max_lon = get_bounding_box(latitude, longitude, radius)
+    queryset = Property.objects.filter(latitude__range=(min_lat, max_lat))
+    if min_lon is not None:
+        queryset = queryset.filter(longitude__range=(min_lon, max_lon))
+
+    queryset = (
+        queryset.annotate(distance_km=haversine_expression(latitude, longitude))
+        .filter(distance_km__lte=radius, distance_km__gte=MIN_NEARBY_DISTANCE_KM)
+        .order_by("distance_km", "id")
+        .values("id", "name", "location", "distance_km")
+    )
+    queryset = queryset[offset : offset + limit] if limit else queryset[offset:]  # noqa: E203
+
+    return [{**_, "distance_km": round(_["distance_km"], 2)} for _ in queryset]
+
+
+# bumped on every change of the data behind the facets | see apps.properties.signals
+PROPERTY_FACETS_VERSION_KEY = "property-facets:version"
+
+
+def invalidate_cached_property_facets():
+    """
+    Drops the cached property facets once the current transaction is committed. Queued per
+    change, a single `incr` of the version key each.
+    """
+
+    transaction.on_commit(functools.partial(incr_cache_counter, PROPERTY_FACETS_VERSION_KEY))
+
+
+def get_price_bucket_labels(price_buckets):
+    """Returns the (label, min, max) of the buckets split at the given `price_buckets`."""
+
+    bounds = [0, *price_buckets, None]
+    return [(f"{lo}-{hi}" if hi is not None else f"{lo}+", lo, hi) for lo, hi in zip(bounds, bounds[1:])]
+
+
+def get_property_facets(queryset, price_buckets):
+    """
+    Returns the property counts per city, room type, gender & price bucket of the given
+    (filtered) queryset. All the facets are grouped in a single UNION ALL query.
+    """
+
+    labels = get_price_bucket_labels(price_buckets)
+    properties = Property.objects.filter(id__in=queryset.values("id")).order_by()
+    facets = {
+        "city": F("city"),
+        "room_type": F("related_property_room_types__room_type__name"),
+        "gender": F("gender"),
+        "price": Case(
+            *[
+                When(related_property_room_types__price_per_month__lt=hi, then=Value(label))
+                for label, _, hi in labels
+                if hi is not None
+            ],
+            When(related_property_room_types__price_per_month__isnull=False, then=Value(labels[-1][0])),
+            output_field=CharField(),
+        ),
+    }
+    querysets = [
+        properties.annotate(facet=Value(name, output_field=CharField()), value=expression)
+        .values("facet", "value")
+        .annotate(count=Count("id", distinct=True))
+        .values_list("facet", "value", "count")
+        for name, expression in facets.items()
+    ]
+
+    data = {name: {} for name in facets}
+    for facet, value, count in querysets[0].union(*querysets[1:], all=True):
+        if value is not None:
+            data[facet][value] = count
+
+    return {
+        **{
+            name: [{"value": k, "count": v} for k, v in sorted(values.items(), key=lambda _: (-_[1], _[0]))]
+            for name, values in data.items()
+            if name != "price"
+        },
+        "price": [
+            {"value": label, "min": lo, "max": hi, "count": data["price"].get(label, 0)} for label, lo, hi in labels
+        ],
+    }
+
+
+def get_cached_property_facets(queryset, signature, price_buckets, timeout):
+    """
+    Cached version of `get_property_facets`. The `signature` identifies the filters of the
+    queryset, entries are dropped on any change of the properties or their room types.
+    """
+
+    version = cache.get(PROPERTY_FACETS_VERSION_KEY, 0)
+    key = f"property-facets:{version}:{hashlib.md5(f'{signature}:{price_buckets}'.encode()).hexdigest()}"
+
+    facets = cache.get(key)
+    if facets is None:
+        facets = get_property_facets(queryset, price_buckets)
+        cache.set(key, facets, timeout=timeout)
+
+    return facets
@@ -30,7 +30,12 @@ class CreateRazorpayOrderView(AppModelCUDAPIViewSet):
             joining_date = serializer.validated_data["joining_date"]
             amount = serializer.validated_data["amount"]
             booking = Booking.objects.create(
-                user=user, property=property_id, room_type=room_type_id, joining_date=joining_date, status="pending"
+                user=user,
+                property=property_id,
+                room_type=room_type_id,
+                joining_date=joining_date,
+                move_out_date=serializer.validated_data.get("move_out_date"),
+                status="pending",
             )
             client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_SECRET_KEY))
             try:
@@ -1,11 +1,15 @@
-from apps.common.helpers import haversine
+from rest_framework.decorators import action
+
 from apps.common.permission_class import RoleBasedPermission
 from apps.common.task import send_sms
 from apps.common.views.api.base import AppAPIView, NonAuthenticatedAPIMixin
 from apps.common.views.api.generic import AppModelCUDAPIViewSet, AppModelListAPIViewSet, AppModelRetrieveAPIViewSet
 from apps.properties.choices import RoleTypeChoices
+from apps.properties.filters import PropertyFilterSet
+from apps.properties.models.booking import BedReservation
 from apps.properties.models.properties import (
     Amenity,
+    Bed,
     Property,
     PropertyAmenity,
     PropertyRoomType,
@@ -16,6 +20,7 @@ from apps.properties.models.properties import (
 from apps.properties.serializers.properties import (
     AmenityListSerializer,
     AmenitySerializer,
+    NearbyPropertiesQuerySerializer,
     PropertyAmenitySerializer,
     PropertyLATandLONSerializer,
     PropertyListSerializer,
@@ -31,6 +36,7 @@ from apps.properties.serializers.properties import (
     TimeSlotListSerializer,
     TimeSlotSerializer,
 )
+from apps.properties.utils import get_cached_nearby_properties, get_cached_property_facets
 
 
 class PropertiesListViewSet(AppModelListAPIViewSet):
@@ -38,14 +44,37 @@ class PropertiesListViewSet(AppModelListAPIViewSet):
 
     serializer_class = PropertyListSerializer
     queryset = Property.objects.all()
-    search_fields = ["name", "location", "city", "area"]
-    filterset_fields = [
-        "location",
-        "related_property_room_types__room_type__name",
-        "related_property_room_types__price_per_month",
-    ]
+    fast_serialization = True
+    cache_responses = True
+    cache_response_depends_on = [Bed, BedReservation]  # `has_available_beds` & `move_in_date` filters
+    search_fields = ["%name", "%location", "%city", "%area"]
+    filterset_class = PropertyFilterSet
+    export_enabled = True
+    etag_actions = ["list"]
     permission_classes = [RoleBasedPermission]
     allowed_roles = [RoleTypeChoices.admin, RoleTypeChoices.guest]
+    facet_price_buckets = [5000, 10000, 15000, 20000, 30000]  # split points of the price facet
+    facet_cache_timeout = 60 * 10
+
+    @action(
+        methods=["GET"],
+        url_path="facets",
+        detail=False,
+    )
+    def facets(self, *args, **kwargs):
+        """
+        Sends the counts of the filter chips (city, room type, gender & price), for the
+        properties that match the current filters. Cached per filter signature.
+        """
+
+        return self.send_response(
+            data=get_cached_property_facets(
+                self.filter_queryset(self.get_queryset()),
+                signature=self.get_filter_signature(),
+                price_buckets=self.facet_price_buckets,
+                timeout=self.facet_cache_timeout,
+            )
+        )
 
 
 class PropertyRetriveViewSet(AppModelRetrieveAPIViewSet):
@@ -53,6 +82,8 @@ class PropertyRetriveViewSet(AppModelRetrieveAPIViewSet):
 
     serializer_class = PropertyRetriveSerializer
     queryset = Property.objects.all()
+    cache_responses = True
+    etag_actions = ["retrieve"]
     permission_classes = [RoleBasedPermission]
     allowed_roles = [RoleTypeChoices.admin, RoleTypeChoices.guest]
 
@@ -71,6 +102,7 @@ class AmenityListViewSet(AppModelListAPIViewSet):
 
     serializer_class = AmenityListSerializer
     queryset = Amenity.objects.all()
+    cache_responses = True
     permission_classes = [RoleBasedPermission]
     allowed_roles = [RoleTypeChoices.admin]
 
@@ -89,6 +121,7 @@ class RoomTypeListViewSet(AppModelListAPIViewSet):
 
     queryset = RoomType.objects.all()
     serializer_class = RoomTypeListSerializer
+    cache_responses = True
     permission_classes = [RoleBasedPermission]
     allowed_roles = [RoleTypeChoices.admin]
 
@@ -125,6 +158,10 @@ class PropertyRoomListViewSet(AppModelListAPIViewSet):
 
     queryset = PropertyRoomType.objects.all()
     serializer_class = PropertyRoomListSerializer
+    fast_serialization = True
+    cache_responses = True
+    export_enabled = True
+    etag_actions = ["list"]
     permission_classes = [RoleBasedPermission]
     allowed_roles = [RoleTypeChoices.admin]
 
@@ -134,6 +171,8 @@ class PropertyRoomRetriveViewSet(AppModelRetrieveAPIViewSet):
 
     queryset = PropertyRoomType.objects.all()
     serializer_class = PropertyRoomRetriveSerializer
+    cache_responses = True
+    etag_actions = ["retrieve"]
     permission_classes = [RoleBasedPermission]
     allowed_roles = [RoleTypeChoices.admin]
 
@@ -150,23 +189,14 @@ class NearbyPropertiesView(AppAPIView):
 
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
-        latitude = serializer.validated_data["latitude"]
-        longitude = serializer.validated_data["longitude"]
-        radius = float(request.query_params.get("radius", 50))
-        properties = Property.objects.all()
-        nearby_places = [
-            {
-                "id": place.id,
-                "name": place.name,
-                "location": place.location,
-                "distance_km": round(haversine(latitude, longitude, float(place.latitude), float(place.longitude)), 2),
-            }
-            for place in properties
-            if haversine(latitude, longitude, float(place.latitude), float(place.longitude)) <= radius
-        ]
-        filtered_places = [place for place in nearby_places if place["distance_km"] > 0.0]
-        sorted_places = sorted(filtered_places, key=lambda x: x["distance_km"])
-        return self.send_response(sorted_places)
+        query_serializer = NearbyPropertiesQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        nearby_places = get_cached_nearby_properties(
+            latitude=serializer.validated_data["latitude"],
+            longitude=serializer.validated_data["longitude"],
+            **query_serializer.validated_data,
+        )
+        return self.send_response(nearby_places)
 
 
 class TimeSlotCUDViewSet(NonAuthenticatedAPIMixin, AppModelCUDAPIViewSet):
@@ -183,6 +213,7 @@ class TimeSlotListViewSet(NonAuthenticatedAPIMixin, AppModelListAPIViewSet):
 
     queryset = TimeSlot.objects.all()
     serializer_class = TimeSlotListSerializer
+    cache_responses = True
     permission_classes = [RoleBasedPermission]
     allowed_roles = [RoleTypeChoices.admin]
 
@@ -237,6 +268,9 @@ class ScheduleVistListOfUserViewSet(AppModelListAPIViewSet):
     """ "List of properties ScheduleVistListOfUserViewSet of the User"""
 
     serializer_class = ScheduleVistListSerilizer
+    cache_responses = True
+    cache_response_vary_on_user = True
+    etag_actions = ["list"]
     permission_classes = [RoleBasedPermission]
     allowed_roles = [RoleTypeChoices.guest]
 
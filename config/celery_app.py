@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.schedules import crontab
 from django.utils.module_loading import import_string
 
 from config import settings
@@ -34,4 +35,14 @@ def is_beat_debug():
     return settings.APP_SWITCHES["CELERY_BEAT_DEBUG_MODE"]
 
 
-app.conf.beat_schedule = {}
+app.conf.beat_schedule = {
+    "sync-bed-occupancy": {
+        "task": "apps.common.task.sync_bed_occupancy",
+        # every minute on debug, to try it out without waiting for the next day
+        "schedule": crontab(minute="*") if is_beat_debug() else crontab(minute=5, hour=0),
+    },
+    "roll-up-property-bed-counters": {
+        "task": "apps.common.task.roll_up_property_bed_counters",
+        "schedule": crontab(minute="*") if is_beat_debug() else crontab(minute="*/5"),
+    },
+}
@@ -36,6 +36,7 @@ DJANGO_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 
@@ -239,12 +240,12 @@ CORS_ALLOW_HEADERS = [
 # ------------------------------------------------------------------------------
 REST_FRAMEWORK = {
     "DEFAULT_PARSER_CLASSES": [
-        "rest_framework.parsers.JSONParser",
+        "apps.common.parsers.AppJSONParser",
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ],
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "apps.common.renderers.AppJSONRenderer",
         "rest_framework.renderers.BrowsableAPIRenderer",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -293,6 +294,46 @@ else:
         }
     }
 
+# Code Revision
+# ------------------------------------------------------------------------------
+# set on deploy (ex: the git sha), versions whatever is derived from the code & cached
+# see apps.common.serializers.get_cached_render_config & the response cache
+APP_CODE_REVISION = env.str("APP_CODE_REVISION", default="development")
+
+# Geo Snapshots
+# ------------------------------------------------------------------------------
+# memory mapped coordinate snapshots shared by all the processes of the host
+# generate with `python manage.py build_geo_snapshots` | see apps.common.spatial_index
+GEO_SNAPSHOT_DIR = env.str("DJANGO_GEO_SNAPSHOT_DIR", default=str(BASE_DIR / "snapshots"))
+# seconds to wait & group the changes before the snapshots are generated again
+GEO_SNAPSHOT_REFRESH_DELAY = env.int("DJANGO_GEO_SNAPSHOT_REFRESH_DELAY", default=60)
+
+# Nearby Properties Cache
+# ------------------------------------------------------------------------------
+# see apps.properties.utils.get_cached_nearby_properties & `manage.py nearby_cache_stats`
+NEARBY_PROPERTIES_CACHE = {
+    # tile edge in degrees, lookups from the same tile share the cached candidates
+    "TILE_SIZE": env.float("DJANGO_NEARBY_CACHE_TILE_SIZE", default=0.01),
+    # radius is rounded up to one of these (km), larger radiuses are not cached
+    "RADIUS_BUCKETS": [1, 2, 5, 10, 20, 50, 100, 200],
+    # edge in degrees of the cells on which the changes are invalidated
+    "INVALIDATION_CELL_SIZE": 1,
+    # entries spanning more cells than this are invalidated on any change
+    "MAX_INVALIDATION_CELLS": 64,
+    "TIMEOUT": env.int("DJANGO_NEARBY_CACHE_TIMEOUT", default=60 * 60),
+}
+
+# Bed Inventory
+# ------------------------------------------------------------------------------
+# redis bitmaps of the free beds | see apps.properties.utils.bed_inventory
+# seconds these are kept, built again from the database on the next lookup
+BED_INVENTORY_TIMEOUT = env.int("DJANGO_BED_INVENTORY_TIMEOUT", default=60 * 60)
+
+# Bed Allocation
+# ------------------------------------------------------------------------------
+# fill_first, spread_out or random | see apps.properties.allocation.BED_ALLOCATION_STRATEGIES
+BED_ALLOCATION_STRATEGY = env.str("DJANGO_BED_ALLOCATION_STRATEGY", default="fill_first")
+
 # Celery
 # ------------------------------------------------------------------------------
 if USE_TZ:
@@ -1,3 +1,5 @@
+from .base import *  # noqa
+
 # GENERAL
 # ------------------------------------------------------------------------------
 DEBUG = False
@@ -13,3 +15,10 @@ TEMPLATES[-1]["OPTIONS"]["loaders"] = [  # noqa
         ],
     )
 ]
+
+# REST FRAMEWORK
+# ------------------------------------------------------------------------------
+# no browsable api in production, json only
+REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = [  # noqa
+    "apps.common.renderers.AppJSONRenderer",
+]